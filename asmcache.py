@@ -0,0 +1,28 @@
+from __future__ import annotations
+import hashlib
+from astcache import AstCache, VERSIONED_MODULES
+
+__all__ = ["AsmCache"]
+
+
+class AsmCache(AstCache):
+    """
+    On-disk cache of the relocatable assembly of single functions, used for incremental compiles
+    A function is keyed by its AST, the table entries it reads while being generated, the compiler
+    options, and the source of every module between the AST and the emitted assembly
+    """
+    STATS_FILE = "asm_stats.json"
+    ENTRY_SUFFIX = ".func"
+    VERSIONED_MODULES = VERSIONED_MODULES + [
+        "tac.py", "tacnodes.py", "cfg.py", "cfgnodes.py", "optimizations.py", "codegen.py", "stackgen.py", "compiler.py", "asmcache.py"
+    ]
+    EVICT_ON_STORE = False
+
+    def function_key(self, func_name:str, ast_text:str, interface:str, options:str) -> str:
+        digest = hashlib.sha256(self.version.encode())
+        for part in (func_name, ast_text, interface, options):
+            # length prefixes keep the boundaries between the parts unambiguous
+            data = part.encode()
+            digest.update(len(data).to_bytes(8, "little"))
+            digest.update(data)
+        return digest.hexdigest()
@@ -0,0 +1,220 @@
+from __future__ import annotations
+import functools
+import hashlib
+import json
+import os
+import pickle
+import threading
+from typing import Any, List, Tuple, Optional, Dict
+from coolast import *
+
+__all__ = ["AstCache", "compiler_version"]
+
+# bump whenever the pickled layout of the maps changes in a way the source hash would not catch
+CACHE_FORMAT = 1
+
+# modules whose source determines what the deserialized maps look like
+VERSIONED_MODULES = ["coolast.py", "deserialize.py", "astcache.py"]
+
+ProgramMaps = Tuple[List[ClassMapEntry], List[ImplMapEntry], List[ParentMapEntry]]
+
+
+class FlatMaps(object):
+    """
+    The maps as a post-order list of operations, for programs nested too deeply for pickle, which recurses once per
+    AST level, pickling the flat list (and unpickling anything) does not recurse
+    Each operation pushes one value: ("atom", value), ("list", n) or ("tuple", n) over the last n values,
+    ("node", cls) over one value per slot of cls, ("absent",) for an unset slot, or ("ref", i) for the i-th
+    list, tuple, or node built so far, which keeps nodes that are shared between classes shared
+    """
+    def __init__(self, maps:ProgramMaps):
+        self.ops:List[Tuple] = []
+        built:Dict[int, int] = {}
+        work_list:List[Tuple[Any, bool]] = [(maps, False)]
+        while work_list:
+            item, children_done = work_list.pop()
+            if children_done:
+                built[id(item)] = len(built)
+                if isinstance(item, (list, tuple)):
+                    self.ops.append((type(item).__name__, len(item)))
+                else:
+                    self.ops.append(("node", type(item)))
+            elif item is ABSENT:
+                self.ops.append(("absent",))
+            elif id(item) in built:
+                self.ops.append(("ref", built[id(item)]))
+            elif isinstance(item, (list, tuple)):
+                work_list.append((item, True))
+                work_list.extend((child, False) for child in reversed(item))
+            elif isinstance(item, (str, int, float, type(None))):
+                self.ops.append(("atom", item))
+            else:
+                work_list.append((item, True))
+                for slot in reversed(node_slots(type(item))):
+                    work_list.append((getattr(item, slot), False) if hasattr(item, slot) else (ABSENT, False))
+
+    def rebuild(self) -> ProgramMaps:
+        stack:List[Any] = []
+        built:List[Any] = []
+        for op in self.ops:
+            kind = op[0]
+            if kind == "atom":
+                stack.append(op[1])
+                continue
+            elif kind == "absent":
+                stack.append(ABSENT)
+                continue
+            elif kind == "ref":
+                stack.append(built[op[1]])
+                continue
+            elif kind == "node":
+                slots = node_slots(op[1])
+                node = op[1].__new__(op[1])
+                values = stack[len(stack) - len(slots):]
+                for slot, value in zip(slots, values):
+                    if value is not ABSENT:
+                        setattr(node, slot, value)
+            else:
+                values = stack[len(stack) - op[1]:]
+                node = values if kind == "list" else tuple(values)
+            del stack[len(stack) - len(values):]
+            stack.append(node)
+            built.append(node)
+        return stack.pop()
+
+
+# stands in for a slot that was never assigned
+ABSENT = object()
+
+
+@functools.lru_cache(maxsize=None)
+def node_slots(cls:type) -> Tuple[str, ...]:
+    return tuple(slot for base in reversed(cls.__mro__) for slot in base.__dict__.get("__slots__", ()))
+
+
+def compiler_version(modules:List[str]=VERSIONED_MODULES) -> str:
+    digest = hashlib.sha256(f"format {CACHE_FORMAT}".encode())
+    base_dir = os.path.dirname(os.path.abspath(__file__))
+    for module in modules:
+        with open(os.path.join(base_dir, module), 'rb') as file:
+            digest.update(file.read())
+    return digest.hexdigest()
+
+
+class AstCache(object):
+    """
+    Content-addressed on-disk cache of the class, implementation, and parent maps
+    Entries are keyed by a hash of the .cl-type input and the compiler version, and the
+    least recently used entries are evicted once the cache grows past max_bytes
+    """
+    STATS_FILE = "stats.json"
+    ENTRY_SUFFIX = ".maps"
+    VERSIONED_MODULES = VERSIONED_MODULES
+    # caches that store many small entries per compile evict once at the end instead
+    EVICT_ON_STORE = True
+
+    def __init__(self, cache_dir:str, max_bytes:int=256 * 1024 * 1024):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.version = compiler_version(self.VERSIONED_MODULES)
+        self.stats:Dict[str, int] = {"hits": 0, "misses": 0, "stores": 0, "evictions": 0, "flattened": 0}
+        os.makedirs(cache_dir, exist_ok=True)
+
+    def key(self, cl_type_file:str) -> str:
+        digest = hashlib.sha256(self.version.encode())
+        with open(cl_type_file, 'rb') as file:
+            for chunk in iter(lambda: file.read(1 << 20), b""):
+                digest.update(chunk)
+        return digest.hexdigest()
+
+    def entry_path(self, key:str) -> str:
+        return os.path.join(self.cache_dir, key + self.ENTRY_SUFFIX)
+
+    def load(self, key:str) -> Optional[ProgramMaps]:
+        path = self.entry_path(key)
+        try:
+            file = open(path, 'rb')
+        except OSError:
+            self.stats["misses"] += 1
+            return None
+
+        try:
+            with file:
+                maps = pickle.load(file)
+            if isinstance(maps, FlatMaps):
+                maps = maps.rebuild()
+        except Exception:
+            # a truncated or stale entry can fail in many ways (renamed classes or slots show up as
+            # AttributeError, ImportError, TypeError, ...), rebuild it instead of failing the compile
+            self.stats["misses"] += 1
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+            return None
+
+        # refresh the timestamp so eviction treats this entry as recently used
+        os.utime(path)
+        self.stats["hits"] += 1
+        return maps
+
+    def store(self, key:str, maps:ProgramMaps) -> None:
+        try:
+            data = pickle.dumps(maps, pickle.HIGHEST_PROTOCOL)
+        except RecursionError:
+            # pickle recurses per AST level, so extremely deep programs are stored flattened instead
+            data = pickle.dumps(FlatMaps(maps), pickle.HIGHEST_PROTOCOL)
+            self.stats["flattened"] += 1
+
+        path = self.entry_path(key)
+        temp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(temp_path, 'wb') as file:
+            file.write(data)
+        os.replace(temp_path, path)
+        self.stats["stores"] += 1
+        if self.EVICT_ON_STORE:
+            self.evict()
+
+    def evict(self) -> None:
+        entries = []
+        total_size = 0
+        for entry in os.scandir(self.cache_dir):
+            if not entry.name.endswith(self.ENTRY_SUFFIX):
+                continue
+            try:
+                stat = entry.stat()
+            except FileNotFoundError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, entry.path))
+            total_size += stat.st_size
+
+        # drop the least recently used entries until we fit in the budget again
+        entries.sort()
+        for _, size, path in entries:
+            if total_size <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            total_size -= size
+            self.stats["evictions"] += 1
+
+    def save_stats(self) -> Dict[str, int]:
+        # fold this run's counters into the running totals kept alongside the cache
+        path = os.path.join(self.cache_dir, self.STATS_FILE)
+        totals = {name: 0 for name in self.stats}
+        try:
+            with open(path, 'r') as file:
+                totals.update(json.load(file))
+        except (OSError, ValueError):
+            pass
+
+        for name, count in self.stats.items():
+            totals[name] += count
+
+        temp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(temp_path, 'w') as file:
+            json.dump(totals, file)
+        os.replace(temp_path, path)
+        return totals
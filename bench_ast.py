@@ -0,0 +1,116 @@
+import os
+import subprocess
+import sys
+import tracemalloc
+import coolast
+from deserialize import *
+
+# Reports how much memory the deserialized program takes per AST node
+# usage: python3 bench_ast.py [--baseline] [file.cl-type ...]   (defaults to tests/life.cl and tests/lam.cl)
+# --baseline also measures the program rebuilt in the old layout (no __slots__, string line numbers, no interning)
+
+# node attributes that hold string literals from coolast.py, which were shared in the old layout as well
+CONSTANT_ATTRS = {"kind", "feature_kind"}
+
+
+def node_attrs(node):
+    if hasattr(node, "__dict__"):
+        yield from node.__dict__.values()
+    for cls in type(node).__mro__:
+        for slot in getattr(cls, "__slots__", ()):
+            if hasattr(node, slot):
+                yield getattr(node, slot)
+
+
+def count_nodes(roots):
+    # returns the number of AST nodes reachable from roots and the bytes held by the node objects themselves
+    nodes = 0
+    node_bytes = 0
+    seen = set()
+    work_list = [roots]
+    while work_list:
+        item = work_list.pop()
+        if id(item) in seen:
+            continue
+        seen.add(id(item))
+
+        if isinstance(item, (list, tuple)):
+            work_list.extend(item)
+        elif type(item).__module__ == coolast.__name__:
+            nodes += 1
+            node_bytes += sys.getsizeof(item)
+            if hasattr(item, "__dict__"):
+                node_bytes += sys.getsizeof(item.__dict__)
+            work_list.extend(node_attrs(item))
+
+    return nodes, node_bytes
+
+
+def slot_names(cls):
+    # base class slots first, the order the old __init__ methods assigned them in
+    for base in reversed(cls.__mro__):
+        yield from base.__dict__.get("__slots__", ())
+
+
+def dict_classes():
+    # a plain class per node class, so instances carry a __dict__ like they did before __slots__
+    return {cls: type(cls.__name__, (), {"__module__": coolast.__name__})
+            for cls in vars(coolast).values()
+            if isinstance(cls, type) and cls.__module__ == coolast.__name__ and "__slots__" in cls.__dict__}
+
+
+def to_baseline(item, classes, memo):
+    # copies item into the old layout, each line of the file became its own str object when it was read
+    if isinstance(item, str):
+        return item[:1] + item[1:]
+    if id(item) in memo:
+        return memo[id(item)]
+    if isinstance(item, (list, tuple)):
+        copy = type(item)(to_baseline(elem, classes, memo) for elem in item)
+    elif type(item) in classes:
+        copy = classes[type(item)]()
+        for name in slot_names(type(item)):
+            if not hasattr(item, name):
+                continue
+            value = getattr(item, name)
+            if name == "lineno":
+                value = str(value)
+            elif name not in CONSTANT_ATTRS:
+                value = to_baseline(value, classes, memo)
+            setattr(copy, name, value)
+    else:
+        copy = item
+    memo[id(item)] = copy
+    return copy
+
+
+def report(label, program, retained):
+    nodes, node_bytes = count_nodes(program)
+    print(f"{label}: {nodes} nodes, {node_bytes / nodes:.1f} bytes/node in node objects, "
+          f"{retained / nodes:.1f} bytes/node retained overall ({retained} bytes)")
+
+
+def measure(cl_type_file, baseline=False):
+    tracemalloc.start()
+    with AstReader.from_file(cl_type_file) as ast:
+        program = read_ast(ast)
+    retained, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    report(cl_type_file, program, retained)
+
+    if baseline:
+        classes = dict_classes()
+        tracemalloc.start()
+        old_program = to_baseline(program, classes, {})
+        old_retained, _ = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        report(f"{cl_type_file} (baseline)", old_program, old_retained)
+
+
+if __name__ == '__main__':
+    baseline = "--baseline" in sys.argv[1:]
+    cl_files = [arg for arg in sys.argv[1:] if arg != "--baseline"] or ["tests/life.cl-type", "tests/lam.cl-type"]
+    for cl_type_file in cl_files:
+        if not os.path.exists(cl_type_file):
+            subprocess.run(["../cool", "--type", cl_type_file[:-len("-type")]])
+        measure(cl_type_file, baseline)
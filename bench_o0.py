@@ -0,0 +1,49 @@
+import glob
+import os
+import subprocess
+import sys
+import time
+from deserialize import *
+from main import compile_maps
+
+# Compares the compile time of the -O0 stack backend against the default pipeline
+# usage: python3 bench_o0.py [file.cl-type ...]   (defaults to every tests/*.cl)
+# Only the backend is timed, every input is deserialized once up front
+
+
+def best_time(maps, opt_level, repeats):
+    best = None
+    for _ in range(repeats):
+        start = time.perf_counter()
+        compile_maps(*maps, opt_level=opt_level)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def main(cl_type_files, repeats=3):
+    total_o1 = 0.0
+    total_o0 = 0.0
+    print(f"{'file':<40}{'-O1 (s)':>10}{'-O0 (s)':>10}{'speedup':>10}")
+    for cl_type_file in cl_type_files:
+        with AstReader.from_file(cl_type_file) as ast:
+            class_map, impl_map, parent_map, _ = read_ast(ast, selective=True)
+        maps = (class_map, impl_map, parent_map)
+
+        o1 = best_time(maps, 1, repeats)
+        o0 = best_time(maps, 0, repeats)
+        total_o1 += o1
+        total_o0 += o0
+        print(f"{os.path.basename(cl_type_file):<40}{o1:>10.4f}{o0:>10.4f}{o1 / o0:>9.1f}x")
+
+    print(f"{'total':<40}{total_o1:>10.4f}{total_o0:>10.4f}{total_o1 / total_o0:>9.1f}x")
+
+
+if __name__ == '__main__':
+    cl_files = sys.argv[1:]
+    if not cl_files:
+        cl_files = [cl_file + "-type" for cl_file in sorted(glob.glob("tests/*.cl"))]
+    for cl_type_file in cl_files:
+        if not os.path.exists(cl_type_file):
+            subprocess.run(["../cool", "--type", cl_type_file[:-len("-type")]])
+    main(cl_files)
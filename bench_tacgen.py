@@ -0,0 +1,51 @@
+import gc
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from deserialize import *
+from tac import Tac
+
+# Times tac generation of a single method as its number of let and if declarations grows
+# usage: python3 bench_tacgen.py [N ...]   (defaults to 1000 2000 4000 8000)
+# Each statement declares one let binding and one if, so linear generation keeps the time per statement flat
+
+
+def write_program(cl_file, statements):
+    body = "".join(f"      let x{i} : Int <- {i} in if x{i} < s then s <- s + x{i} else s <- s - 1 fi;\n"
+                   for i in range(statements))
+    with open(cl_file, "w") as file:
+        file.write("class Main inherits IO {\n  main() : Object {\n    let s : Int <- 0 in {\n"
+                   f"{body}      out_int(s);\n    }}\n  }};\n}};\n")
+
+
+def best_time(maps, repeats):
+    best = None
+    for _ in range(repeats):
+        # like timeit, keep the cyclic collector out of the measurement, its passes grow with the live heap
+        gc.disable()
+        start = time.perf_counter()
+        Tac(*maps).tacgen()
+        elapsed = time.perf_counter() - start
+        gc.enable()
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def main(sizes, repeats=3):
+    print(f"{'statements':>12}{'tacgen (s)':>12}{'us/statement':>14}")
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        for statements in sizes:
+            cl_file = os.path.join(tmp_dir, f"scale{statements}.cl")
+            write_program(cl_file, statements)
+            subprocess.run(["../cool", "--type", cl_file], check=True)
+            with AstReader.from_file(cl_file + "-type") as ast:
+                class_map, impl_map, parent_map, _ = read_ast(ast, selective=True)
+
+            elapsed = best_time((class_map, impl_map, parent_map), repeats)
+            print(f"{statements:>12}{elapsed:>12.4f}{elapsed / statements * 1e6:>14.1f}")
+
+
+if __name__ == '__main__':
+    main([int(arg) for arg in sys.argv[1:]] or [1000, 2000, 4000, 8000])
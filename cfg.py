@@ -1,10 +1,12 @@
 from __future__ import annotations
 from cfgnodes import *
-from optimizations import ConstantPropogator, DeadCodeEliminator
+from optimizations import ConstantPropogator, DeadCodeEliminator, NullCheckEliminator
+from passtimer import PassTimer
 
 class CFG(object):
-    def __init__(self, tacfuncs:List[TacFunc]):
+    def __init__(self, tacfuncs:List[TacFunc], timer:PassTimer=None):
         self.cfg_list:List[CFGFunc] = []
+        self.timer = timer if timer is not None else PassTimer()
         self.process_tacfuncs(tacfuncs)
     
     def process_tacfuncs(self, tacfuncs:List[TacFunc]) -> None:
@@ -27,11 +29,17 @@ class CFG(object):
         pass 
     
     def optimize(self) -> None:
-        self.set_dominators()
+        with self.timer.phase("null_check_elimination"):
+            self.null_check_elimination()
+        with self.timer.phase("set_dominators"):
+            self.set_dominators()
         
-        self.constant_propogate()
-        self.dead_code_elimination()
-        self.calc_interference()
+        with self.timer.phase("constant_propogate"):
+            self.constant_propogate()
+        with self.timer.phase("dead_code_elimination"):
+            self.dead_code_elimination()
+        with self.timer.phase("calc_interference"):
+            self.calc_interference()
         pass
     
     def calc_interference(self) -> None:
@@ -66,6 +74,11 @@ class CFG(object):
             optimizer.optimize()
         pass
 
+    def null_check_elimination(self) -> None:
+        for cfg in self.cfg_list:
+            removed = NullCheckEliminator(cfg).optimize()
+            self.timer.record_stat("null_check_elimination", cfg.name, removed)
+
     def dead_code_elimination(self) -> None:
         for cfg in self.cfg_list:
             optimizer = DeadCodeEliminator(cfg)
@@ -27,9 +27,9 @@ class CFGBlock(object):
     
     def get_branch_labels(self) -> List[TacLabel]:
         last_inst = self.inst_list[-1]
-        if isinstance(last_inst, TacBr):
+        if isinstance(last_inst, (TacBr, TacSwitch)):
             return last_inst.get_branch_targets()
-        elif isinstance(last_inst, (TacRet, TacUnreachable)):
+        elif isinstance(last_inst, (TacRet, TacUnreachable, TacTrap)):
             return []
 
         # error case
@@ -87,7 +87,7 @@ class CFGBlock(object):
             elif isinstance(inst, TacStoreSelf):
                 inst.dest.set_preg(PReg("%r12"))
                 reg_allocator.add_used_reg(PReg("%r12"), inst.dest)
-            elif isinstance(inst, (TacCreate, TacCall, TacSyscall, TacBinOp, TacUnaryOp, TacLoad, TacLoadPrim, TacLoadImm)):
+            elif isinstance(inst, (TacCreate, TacCall, TacSyscall, TacBinOp, TacUnaryOp, TacIcmp, TacLoad, TacLoadPrim, TacLoadImm)):
                 regs_to_alloc.append(inst.dest)
 
         
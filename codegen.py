@@ -1,8 +1,25 @@
 from tacnodes import *
 from cfgnodes import CFGFunc, FixedRegisterAllocator
-from typing import List
+from typing import List, Iterable, TextIO, Tuple, Union
 from collections import defaultdict
 from coolbase import HELPERS
+import re
+
+# label, string, and constant object references in relocatable function bodies look like \0L3\0, \0S1\0,
+# and \0O2\0, NUL never appears in generated assembly so they cannot collide with real text
+RELOC_MARK = "\0"
+RELOC_PATTERN = re.compile("\0([LSO])(\\d+)\0")
+
+# condition codes for TacIcmp, src1 is compared against src2
+SETCC = {TacCmpOp.EQ: "sete", TacCmpOp.NE: "setne", TacCmpOp.LT: "setl", TacCmpOp.LE: "setle"}
+
+# jumps for TacBr, the preceding cmp leaves the flags of src2 - src1 so the ordered conditions are mirrored
+JCC = {TacCmpOp.EQ: "je", TacCmpOp.NE: "jne", TacCmpOp.LT: "jg", TacCmpOp.LE: "jge"}
+# the opposite jumps, taken when the true label is the one that falls through
+JCC_NEGATED = {TacCmpOp.EQ: "jne", TacCmpOp.NE: "je", TacCmpOp.LT: "jle", TacCmpOp.LE: "jl"}
+
+# class tags of the basic classes a constant object can have, these are fixed in Tac
+CONST_OBJECT_TAGS = {"Bool": 0, "Int": 1, "String": 2}
 
 
 class LabelAllocator(object):
@@ -25,11 +42,28 @@ class LabelAllocator(object):
         return label
 
 
+class RelocatableLabelAllocator(LabelAllocator):
+    # numbers labels from zero in each function; the linker shifts them by the labels emitted before it
+    def set_function(self, func_name:str) -> None:
+        super().set_function(func_name)
+        self.cur_label_num = 0
+
+    def emit_label(self, taclabel:TacLabel) -> str:
+        label = self.label_map[taclabel]
+
+        if label == "":
+            label = f"{RELOC_MARK}L{self.cur_label_num}{RELOC_MARK}"
+            self.cur_label_num += 1
+            self.label_map[taclabel] = label
+        return label
+
+
 class StringAllocator(object):
     def __init__(self):
         self.string_map:Dict[str, str] = defaultdict(str)
         self.error_string_map:Dict[str, str] = defaultdict(str)
         self.string_num = 0
+        self.object_map:Dict[Tuple[str, Union[int, str]], str] = {}
 
     def add_string(self, string_name:str) -> str:
         label = self.string_map[string_name]
@@ -40,6 +74,24 @@ class StringAllocator(object):
 
         return label
 
+    def add_object(self, obj_type:str, val:Union[int, str]) -> str:
+        label = self.object_map.get((obj_type, val))
+        if label is None:
+            label = ".LO" + str(len(self.object_map))
+            self.object_map[(obj_type, val)] = label
+
+        return label
+
+    def gen_x86_objects(self, asm:List[str]):
+        # laid out exactly like the objects Int..new and String..new hand back, nothing ever writes to them
+        # String payloads become strings here, so this has to run before gen_x86_strings
+        for (obj_type, val), label in self.object_map.items():
+            payload = self.add_string(val) if obj_type == "String" else val
+            asm.append(f"\t.data\n\t.p2align 3\n")
+            asm.append(f"{label}:\n")
+            asm.append(f"\t.quad {CONST_OBJECT_TAGS[obj_type]}\n\t.quad 4\n\t.quad {obj_type}..vtable\n")
+            asm.append(f"\t.quad {payload}\n")
+
     def gen_x86_strings(self, asm:List[str]):
         for string_name in self.string_map:
             # cool strings differ slightly than how normal strings are processed
@@ -50,6 +102,49 @@ class StringAllocator(object):
 
 
 
+class RelocatableStringAllocator(StringAllocator):
+    # records strings in order of first use so the linker can hand out .LC labels in the serial order
+    def set_function(self) -> None:
+        self.string_map.clear()
+        self.string_num = 0
+        self.object_map.clear()
+
+    def add_string(self, string_name:str) -> str:
+        label = self.string_map[string_name]
+        if not label:
+            label = f"{RELOC_MARK}S{self.string_num}{RELOC_MARK}"
+            self.string_map[string_name] = label
+            self.string_num += 1
+
+        return label
+
+    def add_object(self, obj_type:str, val:Union[int, str]) -> str:
+        label = self.object_map.get((obj_type, val))
+        if label is None:
+            label = f"{RELOC_MARK}O{len(self.object_map)}{RELOC_MARK}"
+            self.object_map[(obj_type, val)] = label
+
+        return label
+
+    def get_strings(self) -> List[str]:
+        return list(self.string_map)
+
+    def get_objects(self) -> List[Tuple[str, Union[int, str]]]:
+        return list(self.object_map)
+
+
+class RelocatableFunc(object):
+    """
+    Assembly for one function generated away from the rest of the program
+    Label, string, and constant object references are still function local and get fixed up by CodeGen.link_func
+    """
+    def __init__(self, text:str, num_labels:int, strings:List[str], objects:List[Tuple[str, Union[int, str]]]):
+        self.text = text
+        self.num_labels = num_labels
+        self.strings = strings
+        self.objects = objects
+
+
 class CodeGen(object):
     def __init__(self, impl_map:List[ImplMapEntry], tacfuncs:List[TacFunc]):
         self.impl_map = impl_map
@@ -59,7 +154,7 @@ class CodeGen(object):
         self.string_allocator = StringAllocator()
         self.stack_alignment = 0
     
-    def gen_x86(self) -> str:
+    def gen_x86(self, relocatable_funcs:List[RelocatableFunc]=None) -> str:
         # generate the code assembly code for the file
         asm:List[str] = []
         
@@ -67,17 +162,75 @@ class CodeGen(object):
         for impl_map_entry in self.impl_map:
             self.gen_x86_vtable(asm, impl_map_entry)
 
-        for tacfunc in self.tacfuncs:
-            self.label_allocator.set_function(tacfunc.name)
-            self.gen_x86_tacfunc(asm, tacfunc)
+        if relocatable_funcs is None:
+            for tacfunc in self.tacfuncs:
+                self.label_allocator.set_function(tacfunc.name)
+                self.gen_x86_tacfunc(asm, tacfunc)
+        else:
+            # functions were generated elsewhere, link them in the same order the serial loop would
+            for relocatable_func in relocatable_funcs:
+                self.link_func(asm, relocatable_func)
         
-        # now generate the string labels
+        # now generate the constant objects and string labels
+        self.string_allocator.gen_x86_objects(asm)
         self.string_allocator.gen_x86_strings(asm)
         
         # builtin methods
         asm.extend(HELPERS)
         return "".join(asm)
     
+    def gen_x86_stream(self, out:TextIO, tacfuncs:Iterable[TacFunc]) -> None:
+        # same output as gen_x86, but each function is written out as soon as it is generated so only
+        # one function's assembly is ever held in memory
+        asm:List[str] = []
+        for impl_map_entry in self.impl_map:
+            self.gen_x86_vtable(asm, impl_map_entry)
+        out.write("".join(asm))
+
+        for tacfunc in tacfuncs:
+            asm = []
+            self.label_allocator.set_function(tacfunc.name)
+            self.gen_x86_tacfunc(asm, tacfunc)
+            out.write("".join(asm))
+
+        asm = []
+        self.string_allocator.gen_x86_objects(asm)
+        self.string_allocator.gen_x86_strings(asm)
+        asm.extend(HELPERS)
+        out.write("".join(asm))
+
+    def gen_relocatable_funcs(self) -> List[RelocatableFunc]:
+        # generate each function on its own, without touching the program wide label and string numbering
+        self.label_allocator = RelocatableLabelAllocator()
+        self.string_allocator = RelocatableStringAllocator()
+        relocatable_funcs:List[RelocatableFunc] = []
+        for tacfunc in self.tacfuncs:
+            asm:List[str] = []
+            self.label_allocator.set_function(tacfunc.name)
+            self.string_allocator.set_function()
+            self.gen_x86_tacfunc(asm, tacfunc)
+            relocatable_funcs.append(RelocatableFunc(
+                "".join(asm), self.label_allocator.cur_label_num, self.string_allocator.get_strings(),
+                self.string_allocator.get_objects()
+            ))
+        return relocatable_funcs
+
+    def link_func(self, asm:List[str], relocatable_func:RelocatableFunc) -> None:
+        label_base = self.label_allocator.cur_label_num
+        self.label_allocator.cur_label_num += relocatable_func.num_labels
+        # allocating in first use order gives every string the label the serial pass would have
+        string_labels = [self.string_allocator.add_string(string) for string in relocatable_func.strings]
+        object_labels = [self.string_allocator.add_object(*obj) for obj in relocatable_func.objects]
+
+        def relocate(match:re.Match) -> str:
+            if match.group(1) == "L":
+                return ".L" + str(label_base + int(match.group(2)))
+            elif match.group(1) == "O":
+                return object_labels[int(match.group(2))]
+            return string_labels[int(match.group(2))]
+
+        asm.append(RELOC_PATTERN.sub(relocate, relocatable_func.text))
+
     def gen_x86_vtable(self, asm:List[str], impl_map_entry:ImplMapEntry):
         class_name = impl_map_entry.class_name
         asm.append(f"\t.data\n\t.globl {class_name}..vtable\n")
@@ -108,8 +261,12 @@ class CodeGen(object):
         for callee_saved in tacfunc.callee_saved:
             asm.append(f"\tpushq\t{callee_saved.get_name()}\n")
 
-        for inst in tacfunc.insts:
-            self.gen_x86_inst(asm, inst)
+        hot_insts, cold_insts = self.split_cold_blocks(tacfunc.insts)
+        for i, inst in enumerate(hot_insts):
+            if isinstance(inst, TacBr):
+                self.gen_x86_branch(asm, inst, hot_insts[i + 1] if i + 1 < len(hot_insts) else None)
+            else:
+                self.gen_x86_inst(asm, inst)
 
         for callee_saved in reversed(tacfunc.callee_saved):
             asm.append(f"\tpopq\t{callee_saved.get_name()}\n")
@@ -117,6 +274,46 @@ class CodeGen(object):
         asm.append("\tmovq\t%rbp, %rsp\n")
         asm.append("\tpopq\t%rbp\n")
         asm.append("\tret\n\n")
+        self.gen_x86_cold_blocks(asm, cold_insts)
+
+    def split_cold_blocks(self, insts:List[TacInst]) -> Tuple[List[TacInst], List[TacInst]]:
+        # error blocks are just a label and a trap, they move out of line so checks fall through to the hot path
+        hot_insts:List[TacInst] = []
+        cold_insts:List[TacInst] = []
+        for i, inst in enumerate(insts):
+            if isinstance(inst, TacTrap) or (isinstance(inst, TacLabel) and i + 1 < len(insts) and isinstance(insts[i + 1], TacTrap)):
+                cold_insts.append(inst)
+            else:
+                hot_insts.append(inst)
+        return hot_insts, cold_insts
+
+    def gen_x86_cold_blocks(self, asm:List[str], cold_insts:List[TacInst]) -> None:
+        if not cold_insts:
+            return
+        asm.append("\t.section\t.text.unlikely,\"ax\",@progbits\n")
+        for inst in cold_insts:
+            if isinstance(inst, TacLabel):
+                asm.append(f"{self.label_allocator.emit_label(inst)}:\n")
+            else:
+                # the runtime stub prints the message for this line and exits, so it is jumped to rather than called
+                asm.append(f"\tmovl\t${inst.lineno}, %edi\n")
+                asm.append(f"\tjmp\t{inst.func}\n")
+        asm.append("\t.text\n")
+
+    def gen_x86_branch(self, asm:List[str], inst:TacBr, next_inst:TacInst=None) -> None:
+        # a target that is the very next label is reached by falling through
+        fallthrough = next_inst.num if isinstance(next_inst, TacLabel) else None
+        if inst.cond is None:
+            if inst.true_label.num != fallthrough:
+                asm.append(f"\tjmp\t{self.label_allocator.emit_label(inst.true_label)}\n")
+            return
+
+        if inst.true_label.num == fallthrough:
+            asm.append(f"\t{JCC_NEGATED[inst.cond]}\t{self.label_allocator.emit_label(inst.false_label)}\n")
+            return
+        asm.append(f"\t{JCC[inst.cond]}\t{self.label_allocator.emit_label(inst.true_label)}\n")
+        if inst.false_label.num != fallthrough:
+            asm.append(f"\tjmp\t{self.label_allocator.emit_label(inst.false_label)}\n")
 
     def gen_x86_inst(self, asm:List[str], inst:TacInst) -> str:
         if isinstance(inst, TacLabel):
@@ -162,6 +359,9 @@ class CodeGen(object):
             dest = inst.dest.get_preg_str()
             if isinstance(inst.imm, TacImmLabel):
                 asm.append(f"\tleaq\t{inst.imm.val}(%rip), {dest}\n")
+            elif isinstance(inst.imm, TacConstObj):
+                obj_label = self.string_allocator.add_object(inst.imm.obj_type, inst.imm.val)
+                asm.append(f"\tleaq\t{obj_label}(%rip), {dest}\n")
             elif isinstance(inst.imm, TacStr):
                 str_label = self.string_allocator.add_string(inst.imm.val)
                 asm.append(f"\tleaq\t{str_label}(%rip), {dest}\n")
@@ -212,18 +412,27 @@ class CodeGen(object):
         elif isinstance(inst, TacRet):
             asm.append(f"\tmovq\t{inst.src.get_preg_str()}, %rax\n")
         elif isinstance(inst, TacCmp):
-            asm.append(f"\tcmpq\t{inst.src1.get_preg_str()}, {inst.src2.get_preg_str()}\n")
-            pass
+            if inst.width == 32:
+                asm.append(f"\tmovq\t{inst.src1.get_preg_str()}, %r11\n")
+                asm.append(f"\tmovq\t{inst.src2.get_preg_str()}, %rax\n")
+                asm.append("\tcmpl\t%r11d, %eax\n")
+            else:
+                asm.append(f"\tcmpq\t{inst.src1.get_preg_str()}, {inst.src2.get_preg_str()}\n")
+        elif isinstance(inst, TacIcmp):
+            asm.append(f"\tmovq\t{inst.src1.get_preg_str()}, %rax\n")
+            asm.append(f"\tmovq\t{inst.src2.get_preg_str()}, %r11\n")
+            self.gen_x86_setcc(asm, inst)
+            asm.append(f"\tmovq\t%rax, {inst.dest.get_preg_str()}\n")
+        elif isinstance(inst, TacSwitch):
+            table_label = self.label_allocator.emit_label(inst.table_label)
+            asm.append(f"\tmovq\t{inst.src.get_preg_str()}, %rax\n")
+            asm.append(f"\tleaq\t{table_label}(%rip), %r11\n")
+            asm.append("\tmovslq\t(%r11,%rax,4), %rax\n")
+            asm.append("\taddq\t%r11, %rax\n")
+            asm.append("\tjmp\t*%rax\n")
+            self.gen_x86_jump_table(asm, table_label, inst.targets)
         elif isinstance(inst, TacBr):
-            if inst.cond is None:
-                asm.append(f"\tjmp\t{self.label_allocator.emit_label(inst.true_label)}\n")
-                return
-            
-            if inst.cond == TacCmpOp.EQ:
-                asm.append(f"\tje\t{self.label_allocator.emit_label(inst.true_label)}\n")
-            elif inst.cond == TacCmpOp.NE:
-                asm.append(f"\tjne\t{self.label_allocator.emit_label(inst.true_label)}\n")
-            asm.append(f"\tjmp\t{self.label_allocator.emit_label(inst.false_label)}\n")
+            self.gen_x86_branch(asm, inst)
         elif isinstance(inst, TacStoreSelf):
             asm.append(f"\tmovq\t{inst.self_obj.get_preg_str()}, {inst.dest.get_preg_str()}\n")
         elif isinstance(inst, TacNot):
@@ -235,6 +444,23 @@ class CodeGen(object):
         elif isinstance(inst, TacUnreachable):
             asm.append(f"\tnop\n")
 
+    def gen_x86_setcc(self, asm:List[str], inst:TacIcmp) -> None:
+        # expects src1 in %rax and src2 in %r11, leaves the 0/1 result in %rax
+        if inst.width == 32:
+            asm.append("\tcmpl\t%r11d, %eax\n")
+        else:
+            asm.append("\tcmpq\t%r11, %rax\n")
+        asm.append(f"\t{SETCC[inst.icmp_op]}\t%al\n")
+        asm.append("\tmovzbq\t%al, %rax\n")
+
+    def gen_x86_jump_table(self, asm:List[str], table_label:str, targets:List[TacLabel]) -> None:
+        # entries are offsets from the table, so a PIE link needs no relocations in .rodata
+        asm.append("\t.section\t.rodata\n\t.p2align 2\n")
+        asm.append(f"{table_label}:\n")
+        for target in targets:
+            asm.append(f"\t.long {self.label_allocator.emit_label(target)} - {table_label}\n")
+        asm.append("\t.text\n")
+
     def move_params(self, asm: List[str], params: List[TacReg], stack: List[PReg]) -> None:
         param_registers = ["%rdi", "%rsi", "%rdx", "%rcx", "%r8", "%r9"]
         stack_params = params[6:]
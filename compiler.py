@@ -0,0 +1,166 @@
+from __future__ import annotations
+from deserialize import *
+from coolast import *
+from tac import Tac
+from tacnodes import TacFunc
+from cfg import CFG
+from codegen import CodeGen, RelocatableFunc
+from stackgen import StackCodeGen
+from asmcache import AsmCache
+from passtimer import PassTimer
+from typing import List, TextIO, Union
+import multiprocessing
+
+__all__ = ["CompileOptions", "compile_typed_ast", "compile_maps", "compile_maps_streaming"]
+
+
+class CompileOptions(object):
+    """
+    Settings for one in-process compile
+    opt_level 0 uses the stack backend and 1 the optimizing one, backend_jobs shards the backend over that many
+    processes, and asm_cache reuses unchanged functions from an AsmCache
+    """
+    def __init__(self, opt_level:int=1, backend_jobs:int=None, asm_cache:AsmCache=None):
+        self.opt_level = opt_level
+        self.backend_jobs = backend_jobs
+        self.asm_cache = asm_cache
+
+
+def compile_typed_ast(typed_ast:Union[str, bytes], options:CompileOptions=None) -> str:
+    """
+    Compiles the text of a .cl-type file to x86 assembly without touching the filesystem
+    Every call builds its own reader, Tac, CFG, and CodeGen, so calls can run repeatedly and from several threads at once
+    """
+    options = options if options is not None else CompileOptions()
+    if isinstance(typed_ast, bytes):
+        typed_ast = typed_ast.decode()
+
+    with AstReader.from_text(typed_ast) as ast:
+        class_map, impl_map, parent_map, _ = read_ast(ast, selective=True)
+    return compile_maps(class_map, impl_map, parent_map, options.backend_jobs, asm_cache=options.asm_cache,
+                        opt_level=options.opt_level)
+
+
+def run_backend(tacfuncs:List[TacFunc], timer:PassTimer=None) -> List[TacFunc]:
+    timer = timer if timer is not None else PassTimer()
+    with timer.phase("build_cfg"):
+        cfg = CFG(tacfuncs, timer)
+    with timer.phase("calc_interference"):
+        cfg.calc_interference()
+    with timer.phase("optimize"):
+        cfg.optimize()
+    #cfg.debug_cfg()
+    with timer.phase("alloc_regs"):
+        cfg.alloc_regs()
+    with timer.phase("resolve_stack_discipline"):
+        cfg.resolve_stack_discipline()
+    return cfg.to_tacfuncs()
+
+
+def make_codegen(impl_map:List[ImplMapEntry], tacfuncs:List[TacFunc], opt_level:int, timer:PassTimer=None) -> CodeGen:
+    # -O0 emits straight from the tac, everything else goes through the cfg and register allocation first
+    if opt_level == 0:
+        return StackCodeGen(impl_map, tacfuncs)
+    return CodeGen(impl_map, run_backend(tacfuncs, timer))
+
+
+def compile_maps(class_map:List[ClassMapEntry], impl_map:List[ImplMapEntry], parent_map:List[ParentMapEntry],
+        backend_jobs:int=None, timer:PassTimer=None, asm_cache:AsmCache=None, opt_level:int=1) -> str:
+    timer = timer if timer is not None else PassTimer()
+    if backend_jobs is not None:
+        # the passes run inside the workers, so only the sharded compile as a whole is measured
+        with timer.phase("sharded_backend"):
+            return compile_maps_sharded(class_map, impl_map, parent_map, backend_jobs, opt_level)
+    if asm_cache is not None:
+        with timer.phase("incremental_backend"):
+            return compile_maps_incremental(class_map, impl_map, parent_map, asm_cache, opt_level)
+
+    with timer.phase("tacgen"):
+        tac = Tac(class_map, impl_map, parent_map)
+        tac.tacgen()
+    if opt_level == 0:
+        with timer.phase("gen_x86"):
+            return StackCodeGen(impl_map, tac.get_tacfuncs()).gen_x86()
+
+    tacfuncs = run_backend(tac.get_tacfuncs(), timer)
+    with timer.phase("gen_x86"):
+        cgen = CodeGen(impl_map, tacfuncs)
+        return cgen.gen_x86()
+
+
+def compile_maps_incremental(class_map:List[ClassMapEntry], impl_map:List[ImplMapEntry], parent_map:List[ParentMapEntry],
+        asm_cache:AsmCache, opt_level:int=1) -> str:
+    # only functions whose key misses the cache go through tac and the backend, everything else is linked as is
+    tac = Tac(class_map, impl_map, parent_map)
+    options = f"-O{opt_level}"
+    relocatable_funcs:List[RelocatableFunc] = []
+    for c in tac.get_classes():
+        tac.begin_class(c)
+        for method in [None] + tac.get_class_methods(c):
+            func_name = f"{c}..new" if method is None else f"{method.parent}.{method.get_name()}"
+            try:
+                ast_text = repr(method) if method is not None else "".join(repr(attr) for attr in tac.class_map[c])
+            except RecursionError:
+                # too deep to describe, always regenerate it
+                ast_text = None
+
+            key = asm_cache.function_key(func_name, ast_text, tac.function_interface(c, method), options) if ast_text is not None else None
+            relocatable_func = asm_cache.load(key) if key is not None else None
+            if relocatable_func is None:
+                tac.processed_funcs = []
+                if method is None:
+                    tac.tacgen_constructor(c)
+                else:
+                    tac.tacgen_func(method)
+                relocatable_func = make_codegen([], tac.get_tacfuncs(), opt_level).gen_relocatable_funcs()[0]
+                if key is not None:
+                    asm_cache.store(key, relocatable_func)
+            relocatable_funcs.append(relocatable_func)
+        tac.end_class()
+
+    asm_cache.evict()
+    # vtables are a handful of lines per class and cheaper to emit again than to look up
+    return CodeGen(impl_map, []).gen_x86(relocatable_funcs)
+
+
+def compile_maps_streaming(class_map:List[ClassMapEntry], impl_map:List[ImplMapEntry], parent_map:List[ParentMapEntry],
+        out:TextIO, opt_level:int=1) -> None:
+    # every function goes through tac, the cfg passes, and codegen on its own and is written out before the next
+    # one is generated, so its ir and live sets are garbage by the time the next function starts
+    tac = Tac(class_map, impl_map, parent_map)
+    if opt_level == 0:
+        StackCodeGen(impl_map, []).gen_x86_stream(out, tac.tacgen_stream())
+        return
+
+    tacfuncs = (run_backend([tacfunc])[0] for tacfunc in tac.tacgen_stream())
+    CodeGen(impl_map, []).gen_x86_stream(out, tacfuncs)
+
+
+# per worker Tac for sharded compiles, the shared tables are built once when the worker starts
+shard_tac:Tac = None
+shard_opt_level = 1
+
+def init_shard_worker(class_map:List[ClassMapEntry], impl_map:List[ImplMapEntry], parent_map:List[ParentMapEntry],
+        opt_level:int) -> None:
+    global shard_tac, shard_opt_level
+    shard_tac = Tac(class_map, impl_map, parent_map)
+    shard_opt_level = opt_level
+
+
+def compile_shard(class_name:str) -> List[RelocatableFunc]:
+    # every function of a class goes through tac, the cfg passes and codegen without looking at other classes
+    shard_tac.processed_funcs = []
+    shard_tac.tacgen_class(class_name)
+    return make_codegen([], shard_tac.get_tacfuncs(), shard_opt_level).gen_relocatable_funcs()
+
+
+def compile_maps_sharded(class_map:List[ClassMapEntry], impl_map:List[ImplMapEntry], parent_map:List[ParentMapEntry],
+        jobs:int, opt_level:int=1) -> str:
+    classes = Tac(class_map, impl_map, parent_map).get_classes()
+    initargs = (class_map, impl_map, parent_map, opt_level)
+    with multiprocessing.Pool(jobs, initializer=init_shard_worker, initargs=initargs) as pool:
+        # map keeps the shards in class order, which is what makes the linked output match the serial one
+        shards = pool.map(compile_shard, classes, chunksize=1)
+
+    cgen = CodeGen(impl_map, [])
+    return cgen.gen_x86([func for shard in shards for func in shard])
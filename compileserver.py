@@ -0,0 +1,147 @@
+from __future__ import annotations
+import argparse
+import asyncio
+import os
+import signal
+import socket
+import struct
+import sys
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import List, Tuple
+from compiler import compile_typed_ast
+
+# Keeps the compiler warm behind a local Unix socket so builds stop paying interpreter startup and
+# import cost on every compile.
+#
+#   python3 compileserver.py serve /tmp/coolc.sock -j 4
+#   python3 compileserver.py compile /tmp/coolc.sock tests/*.cl-type
+#
+# Protocol: the client sends a 4 byte big-endian length followed by the .cl-type payload; the server
+# answers with a status byte (0 = ok, 1 = error), a 4 byte length, and the assembly or error message.
+REQUEST_HEADER = struct.Struct("!I")
+RESPONSE_HEADER = struct.Struct("!BI")
+STATUS_OK = 0
+STATUS_ERROR = 1
+
+
+def compile_payload(payload:bytes) -> str:
+    # runs in a pool worker; every request gets its own Tac/CFG/CodeGen so nothing leaks between compiles
+    return compile_typed_ast(payload)
+
+
+class CompileServer(object):
+    def __init__(self, socket_path:str, jobs:int):
+        self.socket_path = socket_path
+        self.jobs = jobs
+        self.executor = ProcessPoolExecutor(jobs)
+
+    async def compile(self, payload:bytes) -> Tuple[int, str]:
+        loop = asyncio.get_running_loop()
+        try:
+            return STATUS_OK, await loop.run_in_executor(self.executor, compile_payload, payload)
+        except BrokenProcessPool:
+            # a worker died mid-compile, start over with fresh workers so later requests still work
+            self.executor.shutdown(wait=False)
+            self.executor = ProcessPoolExecutor(self.jobs)
+            return STATUS_ERROR, "compiler worker crashed"
+        except Exception as e:
+            return STATUS_ERROR, f"{type(e).__name__}: {e}"
+
+    async def handle_client(self, reader:asyncio.StreamReader, writer:asyncio.StreamWriter) -> None:
+        try:
+            while True:
+                try:
+                    header = await reader.readexactly(REQUEST_HEADER.size)
+                except asyncio.IncompleteReadError:
+                    break
+                (length,) = REQUEST_HEADER.unpack(header)
+                payload = await reader.readexactly(length)
+
+                status, result = await self.compile(payload)
+                data = result.encode()
+                writer.write(RESPONSE_HEADER.pack(status, len(data)) + data)
+                await writer.drain()
+        finally:
+            writer.close()
+
+    async def serve(self) -> None:
+        if os.path.exists(self.socket_path):
+            os.remove(self.socket_path)
+        server = await asyncio.start_unix_server(self.handle_client, path=self.socket_path)
+        # stop on SIGTERM as well as ^C so the socket file is removed when run under a supervisor
+        loop = asyncio.get_running_loop()
+        for signum in (signal.SIGINT, signal.SIGTERM):
+            loop.add_signal_handler(signum, asyncio.current_task().cancel)
+        try:
+            async with server:
+                await server.serve_forever()
+        finally:
+            self.executor.shutdown()
+            if os.path.exists(self.socket_path):
+                os.remove(self.socket_path)
+
+
+def recv_exactly(sock:socket.socket, size:int) -> bytes:
+    chunks = []
+    while size:
+        chunk = sock.recv(size)
+        if not chunk:
+            raise ConnectionError("compile server closed the connection")
+        chunks.append(chunk)
+        size -= len(chunk)
+    return b"".join(chunks)
+
+
+def request_compile(sock:socket.socket, payload:bytes) -> Tuple[int, str]:
+    sock.sendall(REQUEST_HEADER.pack(len(payload)) + payload)
+    status, length = RESPONSE_HEADER.unpack(recv_exactly(sock, RESPONSE_HEADER.size))
+    return status, recv_exactly(sock, length).decode()
+
+
+def compile_remote(socket_path:str, cl_type_files:List[str]) -> bool:
+    ok = True
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+        sock.connect(socket_path)
+        for cl_type_file in cl_type_files:
+            try:
+                with open(cl_type_file, 'rb') as file:
+                    payload = file.read()
+            except OSError as e:
+                ok = False
+                print(f"FAIL  {cl_type_file}: {e}", file=sys.stderr)
+                continue
+
+            status, result = request_compile(sock, payload)
+
+            if status != STATUS_OK:
+                ok = False
+                print(f"FAIL  {cl_type_file}: {result}", file=sys.stderr)
+                continue
+            with open(cl_type_file[:-8] + ".s", "w") as file:
+                file.write(result)
+    return ok
+
+
+def main(argv):
+    parser = argparse.ArgumentParser(prog=argv[0], description="warm COOL compile server")
+    commands = parser.add_subparsers(dest="command", required=True)
+    serve_parser = commands.add_parser("serve", help="run the compile server")
+    serve_parser.add_argument("socket_path")
+    serve_parser.add_argument("-j", "--jobs", type=int, default=os.cpu_count(), metavar="N",
+                              help="number of warm compiler processes")
+    compile_parser = commands.add_parser("compile", help="compile files through a running server")
+    compile_parser.add_argument("socket_path")
+    compile_parser.add_argument("cl_type_files", nargs="+", metavar="cl_type_file")
+    args = parser.parse_args(argv[1:])
+
+    if args.command == "serve":
+        try:
+            asyncio.run(CompileServer(args.socket_path, args.jobs).serve())
+        except (KeyboardInterrupt, asyncio.CancelledError):
+            pass
+    elif not compile_remote(args.socket_path, args.cl_type_files):
+        sys.exit(1)
+
+if __name__ == '__main__':
+    main(sys.argv)
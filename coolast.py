@@ -5,14 +5,16 @@ class TypeCheckError(Exception):
     pass
 
 class Identifier:
-    def __init__(self, lineno:str, name:str):
+    __slots__ = ("lineno", "name")
+
+    def __init__(self, lineno:int, name:str):
         self.lineno = lineno
         self.name = name
     
     def __repr__(self) -> str:
         return f"{self.lineno}\n{self.name}\n"
     
-    def get_lineno(self) -> str:
+    def get_lineno(self) -> int:
         return self.lineno
     
     def get_name(self) -> str:
@@ -20,6 +22,8 @@ class Identifier:
 
 
 class Formal:
+    __slots__ = ("name_id", "type_id")
+
     def __init__(self, name:Identifier, formal_type:Identifier):
         self.name_id = name
         self.type_id = formal_type
@@ -33,15 +37,17 @@ class Formal:
     def get_type(self) -> str:
         return self.type_id.get_name()
 
-    def get_name_lineno(self) -> str:
+    def get_name_lineno(self) -> int:
         return self.name_id.get_lineno()
 
-    def get_type_lineno(self) -> str:
+    def get_type_lineno(self) -> int:
         return self.type_id.get_lineno()
 
 
 class Expression:
-    def __init__(self, lineno:str, kind:str, exp_type:str=None):
+    __slots__ = ("lineno", "kind", "exp_type")
+
+    def __init__(self, lineno:int, kind:str, exp_type:str=None):
         self.lineno = lineno
         self.kind = kind
         self.exp_type = exp_type
@@ -55,7 +61,7 @@ class Expression:
     def get_kind(self) -> str:
         return self.kind
 
-    def get_lineno(self) -> str:
+    def get_lineno(self) -> int:
         return self.lineno
 
     def set_type(self, exp_type:str):
@@ -63,6 +69,8 @@ class Expression:
 
 
 class Internal(Expression):
+    __slots__ = ("name",)
+
     def __init__(self, exp_type:str, name:str):
         super().__init__(0, "internal", exp_type)
         self.name = name
@@ -72,6 +80,8 @@ class Internal(Expression):
 
 
 class Feature:
+    __slots__ = ("feature_kind", "name_id", "type_id")
+
     def __init__(self, feature_kind: str, feature_name:Identifier, feature_type:Identifier):
         self.feature_kind = feature_kind
         self.name_id = feature_name
@@ -86,15 +96,17 @@ class Feature:
     def get_type(self) -> str:
         return self.type_id.get_name()
 
-    def get_name_lineno(self) -> str:
+    def get_name_lineno(self) -> int:
         return self.name_id.get_lineno()
     
-    def get_type_lineno(self) -> str:
+    def get_type_lineno(self) -> int:
         return self.type_id.get_lineno()
 
 
 
 class Method(Feature):
+    __slots__ = ("formal_list", "body", "parent")
+
     def __init__(self, feature_name:Identifier, feature_type:Identifier, 
                  formal_list:List[Formal], body:Expression, parent:str=None):
         super().__init__("method", feature_name, feature_type)
@@ -131,6 +143,8 @@ class Method(Feature):
 
 
 class Attribute(Feature):
+    __slots__ = ("init",)
+
     def __init__(self, feature_name:Identifier, feature_type:Identifier, init:Expression):
         super().__init__("attribute_no_init" if init is None else "attribute_init", feature_name, feature_type)
         self.init = init
@@ -150,7 +164,9 @@ class Attribute(Feature):
 
 
 class Assign(Expression):
-    def __init__(self, lineno:str, lhs:Identifier, rhs:Expression, exp_type:str=None):
+    __slots__ = ("lhs", "rhs")
+
+    def __init__(self, lineno:int, lhs:Identifier, rhs:Expression, exp_type:str=None):
         super().__init__(lineno, "assign", exp_type)
         self.lhs = lhs
         self.rhs = rhs
@@ -160,7 +176,9 @@ class Assign(Expression):
 
 
 class Dispatch(Expression):
-    def __init__(self, lineno:str, kind:str, method:Identifier, args:List[Expression],
+    __slots__ = ("obj", "method", "args", "class_type")
+
+    def __init__(self, lineno:int, kind:str, method:Identifier, args:List[Expression],
             obj:Expression=None, class_type:Identifier=None, exp_type:str=None):
         super().__init__(lineno, kind, exp_type)
         self.obj = obj
@@ -184,6 +202,8 @@ class Dispatch(Expression):
 
 
 class DynamicDispatch(Dispatch):
+    __slots__ = ()
+
     def __init__(self, lineno, obj:Expression, method:Identifier, args:List[Expression], exp_type:str=None):
         super().__init__(lineno, "dynamic_dispatch", method, args, obj, None, exp_type)
 
@@ -193,7 +213,9 @@ class DynamicDispatch(Dispatch):
 
 
 class StaticDispatch(Dispatch):
-    def __init__(self, lineno:str, obj:Expression, class_type:Identifier, 
+    __slots__ = ()
+
+    def __init__(self, lineno:int, obj:Expression, class_type:Identifier, 
                  method:Identifier, args:List[Expression], exp_type:str=None):
         super().__init__(lineno, "static_dispatch", method, args, obj, class_type, exp_type)
 
@@ -202,7 +224,9 @@ class StaticDispatch(Dispatch):
 
 
 class SelfDispatch(Dispatch):
-    def __init__(self, lineno: str, method:Identifier, args:List[Expression], exp_type:str=None):
+    __slots__ = ()
+
+    def __init__(self, lineno: int, method:Identifier, args:List[Expression], exp_type:str=None):
         super().__init__(lineno, "self_dispatch", method, args, None, None, exp_type)
 
     def __repr__(self) -> str:
@@ -210,6 +234,8 @@ class SelfDispatch(Dispatch):
 
 
 class If(Expression):
+    __slots__ = ("condition", "then_body", "else_body")
+
     def __init__(self, lineno, condition:Expression, then_body:Expression, else_body:Expression, exp_type:str=None):
         super().__init__(lineno, "if", exp_type)
         self.condition = condition
@@ -221,7 +247,9 @@ class If(Expression):
 
 
 class While(Expression):
-    def __init__(self, lineno:str, condition:Expression, while_body:Expression, exp_type:str=None):
+    __slots__ = ("condition", "while_body")
+
+    def __init__(self, lineno:int, condition:Expression, while_body:Expression, exp_type:str=None):
         super().__init__(lineno, "while", exp_type)
         self.condition = condition
         self.while_body = while_body
@@ -231,7 +259,9 @@ class While(Expression):
 
     
 class Block(Expression):
-    def __init__(self, lineno: str, body:List[Expression], exp_type:str=None):
+    __slots__ = ("body",)
+
+    def __init__(self, lineno: int, body:List[Expression], exp_type:str=None):
         super().__init__(lineno, "block", exp_type)
         self.body = body
 
@@ -244,7 +274,9 @@ class Block(Expression):
 
 
 class UnaryOp(Expression):
-    def __init__(self, lineno:str, rhs:Expression, kind:str, exp_type:str=None):
+    __slots__ = ("rhs",)
+
+    def __init__(self, lineno:int, rhs:Expression, kind:str, exp_type:str=None):
         super().__init__(lineno, kind, exp_type)
         self.rhs:Expression = rhs
 
@@ -253,7 +285,9 @@ class UnaryOp(Expression):
 
 
 class IsVoid(UnaryOp):
-    def __init__(self, lineno: str, rhs: Expression, exp_type:str=None):
+    __slots__ = ()
+
+    def __init__(self, lineno: int, rhs: Expression, exp_type:str=None):
         super().__init__(lineno, rhs, "isvoid", exp_type)
 
     def __repr__(self) -> str:
@@ -261,7 +295,9 @@ class IsVoid(UnaryOp):
 
 
 class Not(UnaryOp):
-    def __init__(self, lineno: str, rhs: Expression, exp_type:str=None):
+    __slots__ = ()
+
+    def __init__(self, lineno: int, rhs: Expression, exp_type:str=None):
         super().__init__(lineno, rhs, "not", exp_type)
     
     def __repr__(self) -> str:
@@ -269,7 +305,9 @@ class Not(UnaryOp):
 
 
 class Negate(UnaryOp):
-    def __init__(self, lineno: str, rhs: Expression, exp_type:str=None):
+    __slots__ = ()
+
+    def __init__(self, lineno: int, rhs: Expression, exp_type:str=None):
         super().__init__(lineno, rhs, "negate", exp_type)
 
     def __repr__(self) -> str:
@@ -277,7 +315,9 @@ class Negate(UnaryOp):
 
 
 class Integer(Expression):
-    def __init__(self, lineno:str, val:str, exp_type:str=None):
+    __slots__ = ("val",)
+
+    def __init__(self, lineno:int, val:str, exp_type:str=None):
         super().__init__(lineno, "integer", exp_type)
         self.val = val
     
@@ -286,7 +326,9 @@ class Integer(Expression):
 
 
 class StringExp(Expression):
-    def __init__(self, lineno:str, val:str, exp_type:str=None):
+    __slots__ = ("val",)
+
+    def __init__(self, lineno:int, val:str, exp_type:str=None):
         super().__init__(lineno, "string", exp_type)
         self.val = val
     
@@ -294,7 +336,9 @@ class StringExp(Expression):
         return super().__repr__() + f"{self.val}\n"
 
 class New(Expression):
-    def __init__(self, lineno:str, class_name:Identifier, exp_type:str=None):
+    __slots__ = ("class_name",)
+
+    def __init__(self, lineno:int, class_name:Identifier, exp_type:str=None):
         super().__init__(lineno, 'new', exp_type)
         self.class_name = class_name
     
@@ -303,7 +347,9 @@ class New(Expression):
 
 
 class Binop(Expression):
-    def __init__(self, lineno:str, lhs:str, rhs:str, kind:str, exp_type:str=None):
+    __slots__ = ("lhs", "rhs")
+
+    def __init__(self, lineno:int, lhs:str, rhs:str, kind:str, exp_type:str=None):
         super().__init__(lineno, kind, exp_type)
         self.lhs:Expression = lhs
         self.rhs:Expression = rhs
@@ -313,7 +359,9 @@ class Binop(Expression):
 
 
 class Plus(Binop):
-    def __init__(self, lineno:str, lhs:str, rhs:str, exp_type:str=None):
+    __slots__ = ()
+
+    def __init__(self, lineno:int, lhs:str, rhs:str, exp_type:str=None):
         super().__init__(lineno, lhs, rhs, 'plus', exp_type)
     
     def __repr__(self) -> str:
@@ -321,7 +369,9 @@ class Plus(Binop):
 
 
 class Minus(Binop):
-    def __init__(self, lineno:str, lhs:str, rhs:str, exp_type:str=None):
+    __slots__ = ()
+
+    def __init__(self, lineno:int, lhs:str, rhs:str, exp_type:str=None):
         super().__init__(lineno, lhs, rhs, 'minus', exp_type)
 
     def __repr__(self) -> str:
@@ -329,7 +379,9 @@ class Minus(Binop):
 
 
 class Times(Binop):
-    def __init__(self, lineno:str, lhs:str, rhs:str, exp_type:str=None):
+    __slots__ = ()
+
+    def __init__(self, lineno:int, lhs:str, rhs:str, exp_type:str=None):
         super().__init__(lineno, lhs, rhs, 'times', exp_type)
     
     def __repr__(self) -> str:
@@ -337,7 +389,9 @@ class Times(Binop):
 
 
 class Divide(Binop):
-    def __init__(self, lineno:str, lhs:str, rhs:str, exp_type:str=None):
+    __slots__ = ()
+
+    def __init__(self, lineno:int, lhs:str, rhs:str, exp_type:str=None):
         super().__init__(lineno, lhs, rhs, 'divide', exp_type)
     
     def __repr__(self) -> str:
@@ -345,7 +399,9 @@ class Divide(Binop):
 
 
 class Lt(Binop):
-    def __init__(self, lineno:str, lhs:str, rhs:str, exp_type:str=None):
+    __slots__ = ()
+
+    def __init__(self, lineno:int, lhs:str, rhs:str, exp_type:str=None):
         super().__init__(lineno, lhs, rhs, 'lt', exp_type)
 
     def __repr__(self) -> str:
@@ -353,7 +409,9 @@ class Lt(Binop):
 
 
 class Le(Binop):
-    def __init__(self, lineno:str, lhs:str, rhs:str, exp_type:str=None):
+    __slots__ = ()
+
+    def __init__(self, lineno:int, lhs:str, rhs:str, exp_type:str=None):
         super().__init__(lineno, lhs, rhs, 'le', exp_type)
 
     def __repr__(self) -> str:
@@ -361,7 +419,9 @@ class Le(Binop):
 
 
 class Eq(Binop):
-    def __init__(self, lineno:str, lhs:str, rhs:str, exp_type:str=None):
+    __slots__ = ()
+
+    def __init__(self, lineno:int, lhs:str, rhs:str, exp_type:str=None):
         super().__init__(lineno, lhs, rhs, 'eq', exp_type)
 
     def __repr__(self) -> str:
@@ -369,7 +429,9 @@ class Eq(Binop):
 
 
 class Bool(Expression):
-    def __init__(self, lineno: str, val:str, exp_type:str=None):
+    __slots__ = ()
+
+    def __init__(self, lineno: int, val:str, exp_type:str=None):
         super().__init__(lineno, val, exp_type)
 
     def __repr__(self) -> str:
@@ -377,7 +439,9 @@ class Bool(Expression):
 
 
 class Variable(Expression):
-    def __init__(self, lineno: str, var:Identifier, exp_type:str=None):
+    __slots__ = ("var",)
+
+    def __init__(self, lineno: int, var:Identifier, exp_type:str=None):
         super().__init__(lineno, "identifier", exp_type)
         self.var = var
 
@@ -386,6 +450,8 @@ class Variable(Expression):
 
 
 class LetBinding:
+    __slots__ = ("var", "var_type", "val")
+
     def __init__(self, var:Identifier, var_type:Identifier, val:Expression = None):
         self.var = var
         self.var_type = var_type
@@ -404,7 +470,9 @@ class LetBinding:
 
 
 class Let(Expression):
-    def __init__(self, lineno: str, binding_list:List[LetBinding], expr:Expression, exp_type:str=None):
+    __slots__ = ("binding_list", "expr")
+
+    def __init__(self, lineno: int, binding_list:List[LetBinding], expr:Expression, exp_type:str=None):
         super().__init__(lineno, "let", exp_type)
         self.binding_list = binding_list
         self.expr = expr
@@ -418,6 +486,8 @@ class Let(Expression):
 
 
 class CaseElement:
+    __slots__ = ("formal", "expr")
+
     def __init__(self, formal:Formal, expr:Expression):
         self.formal = formal
         self.expr = expr
@@ -431,15 +501,17 @@ class CaseElement:
     def get_type(self) -> str:
         return self.formal.get_type()
     
-    def get_name_lineno(self) -> str:
+    def get_name_lineno(self) -> int:
         return self.formal.get_name_lineno()
     
-    def get_type_lineno(self) -> str:
+    def get_type_lineno(self) -> int:
         return self.formal.get_type_lineno()
 
 
 class Case(Expression):
-    def __init__(self, lineno: str, case_expr:Expression, case_list:List[CaseElement], exp_type:str=None):
+    __slots__ = ("case_expr", "case_list")
+
+    def __init__(self, lineno: int, case_expr:Expression, case_list:List[CaseElement], exp_type:str=None):
         super().__init__(lineno, "case", exp_type)
         self.case_expr = case_expr
         self.case_list = case_list
@@ -454,6 +526,8 @@ class Case(Expression):
 
 
 class Class:
+    __slots__ = ("class_id", "pred_id", "feature_list")
+
     def __init__(self, class_name:Identifier, pred:Identifier, feature_list:List[Feature]):
         self.class_id = class_name
         self.pred_id = pred
@@ -495,6 +569,8 @@ class Class:
 
 
 class ClassAttribute:
+    __slots__ = ("attr_name", "attr_kind", "attr_type", "attr_expr")
+
     def __init__(self, attr_name:str, attr_kind:str, attr_type:str, attr_expr:Expression=None):
         self.attr_name = attr_name
         self.attr_kind = attr_kind
@@ -513,6 +589,8 @@ class ClassAttribute:
 
 
 class ImplMethod:
+    __slots__ = ("method_name", "formal_list", "parent", "expr")
+
     def __init__(self, method_name:str, formal_list:List[str], parent:str, expr:Expression=None):
         self.method_name = method_name
         self.formal_list = formal_list
@@ -536,6 +614,8 @@ class ImplMethod:
 
 
 class ClassMapEntry:
+    __slots__ = ("class_name", "attr_list")
+
     def __init__(self, class_name:str, attr_list:List[ClassAttribute]):
         self.class_name = class_name
         self.attr_list = attr_list
@@ -550,6 +630,8 @@ class ClassMapEntry:
 
 
 class ImplMapEntry:
+    __slots__ = ("class_name", "method_list")
+
     def __init__(self, class_name:str, method_list:List[ImplMethod]):
         self.class_name = class_name
         self.method_list = method_list
@@ -564,6 +646,8 @@ class ImplMapEntry:
 
 
 class ParentMapEntry:
+    __slots__ = ("parent", "child")
+
     def __init__(self, parent:str, child:str):
         self.parent = parent
         self.child = child
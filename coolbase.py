@@ -365,24 +365,27 @@ String..new:
     """
 
 def _build_bool_new():
+    # the only two Bool objects, generated code and the comparison helpers hand out pointers to these
+    # Bool..true must directly follow Bool..false, Tac boxes a raw value as Bool..false + 32 * value
     return """\
+\t.data
+\t.p2align 3
+\t.globl Bool..false
+Bool..false:
+\t.quad 0
+\t.quad 4
+\t.quad Bool..vtable
+\t.quad 0
+\t.globl Bool..true
+Bool..true:
+\t.quad 0
+\t.quad 4
+\t.quad Bool..vtable
+\t.quad 1
 \t.text
 \t.globl Bool..new
 Bool..new:
-\tpushq\t%rbp
-\tmovq\t%rsp, %rbp
-\tmovq\t$32, %rdi
-\tcall\tmalloc@PLT
-\txor\t%edi, %edi
-\tmovq\t%rdi, 0(%rax)
-\tmovq\t$4, %rdi
-\tmovq\t%rdi, 8(%rax)
-\tleaq\tBool..vtable(%rip), %rdi
-\tmovq\t%rdi, 16(%rax)
-\txor\t%edi, %edi
-\tmovq\t%rdi, 24(%rax)
-\tmovq\t%rbp, %rsp
-\tpopq\t%rbp
+\tleaq\tBool..false(%rip), %rax
 \tret
 
     """
@@ -432,12 +435,10 @@ eq_helper:
 \tcmp\t%rsi, %rdi
 \tje\teq_true
 eq_false:
-\tcall\tBool..new
+\tleaq\tBool..false(%rip), %rax
 \tjmp\teq_end
 eq_true:
-\tcall\tBool..new
-\tmovq\t$1, %rcx
-\tmovq\t%rcx, 24(%rax)
+\tleaq\tBool..true(%rip), %rax
 \tjmp\teq_end
 eq_bool:
 eq_int:
@@ -484,12 +485,10 @@ lt_helper:
 \tcmpq\t%r9, %rcx
 \tje\tlt_string
 lt_false:
-\tcall\tBool..new
+\tleaq\tBool..false(%rip), %rax
 \tjmp\tlt_end
 lt_true:
-\tcall\tBool..new
-\tmovq\t$1, %rcx
-\tmovq\t%rcx, 24(%rax)
+\tleaq\tBool..true(%rip), %rax
 \tjmp\tlt_end
 lt_bool:
 lt_int:
@@ -540,12 +539,10 @@ le_helper:
 \tcmp\t%rsi, %rdi
 \tje\tle_true
 le_false:
-\tcall\tBool..new
+\tleaq\tBool..false(%rip), %rax
 \tjmp\tle_end
 le_true:
-\tcall\tBool..new
-\tmovq\t$1, %rcx
-\tmovq\t%rcx, 24(%rax)
+\tleaq\tBool..true(%rip), %rax
 \tjmp\tle_end
 le_bool:
 le_int:
@@ -881,6 +878,28 @@ coolgetstr:
 \t.size   coolgetstr, .-coolgetstr
 """
 
+def _build_error_stub(name:str, message:str):
+    # shared by every outlined error block of one kind, they jump here with the line number in %edi
+    # the stack is realigned for printf since it is reached from arbitrary depths and never returns
+    return f"""\
+\t.section\t.rodata
+.LC{name}:
+\t.asciz "ERROR: %d: Exception: {message}\\n"
+\t.section\t.text.unlikely,"ax",@progbits
+\t.globl {name}
+{name}:
+\tmovl\t%edi, %esi
+\tleaq\t.LC{name}(%rip), %rdi
+\tandq\t$-16, %rsp
+\txor\t%eax, %eax
+\tcall\tprintf@PLT
+\txor\t%edi, %edi
+\tcall\texit@PLT
+\tnop
+\t.text
+
+"""
+
 HELPERS = [
     _build_io_outint(),
     _build_io_outstring(),
@@ -905,5 +924,9 @@ HELPERS = [
     _build_coolstrlen(),
     _build_coolstrcat(),
     _build_coolsubstr(),
-    _build_coolgetstr()
+    _build_coolgetstr(),
+    _build_error_stub("dispatch_void_error", "dispatch on void"),
+    _build_error_stub("case_void_error", "case on void"),
+    _build_error_stub("case_unmatched_error", "case without matching branch"),
+    _build_error_stub("div_zero_error", "division by zero")
 ]
\ No newline at end of file
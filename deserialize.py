@@ -1,15 +1,81 @@
+from __future__ import annotations
 import sys
-from typing import List, Any, Callable, Tuple
+import mmap
+from typing import List, Any, Callable, Tuple, Iterable, Iterator, Generator, Dict
 from coolast import *
 
-__all__ = ["read_ast"]
+__all__ = ["read_ast", "AstReader"]
+
+
+class AstReader(object):
+    """
+    Forward, streaming reader over the lines of a serialized AST
+    Lines are pulled one at a time, so the input is never held in memory as a whole
+    """
+    def __init__(self, lines:Iterable[str], closer:Callable[[], None]=None):
+        self.lines:Iterator[str] = iter(lines)
+        self.closer = closer
+
+    @classmethod
+    def from_file(cls, path:str, use_mmap:bool=True) -> AstReader:
+        file = open(path, 'rb')
+        if use_mmap:
+            try:
+                buf = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+            except ValueError:
+                # empty files cannot be mapped, fall back to buffered reads
+                buf = None
+
+            if buf is not None:
+                def close_mmap() -> None:
+                    buf.close()
+                    file.close()
+                return cls((line.decode() for line in iter(buf.readline, b"")), close_mmap)
+
+        return cls((line.decode() for line in file), file.close)
+
+    @classmethod
+    def from_text(cls, text:str) -> AstReader:
+        # only \n ends a line, as when reading a file, splitlines() would also break string literals holding \f, \v, \x85, ...
+        lines = text.split("\n")
+        if lines and not lines[-1]:
+            lines.pop()
+        return cls(lines)
+
+    def read_line(self) -> str:
+        # a bare StopIteration would quietly end whatever generator is reading us, so report truncation instead
+        line = next(self.lines, None)
+        if line is None:
+            raise EOFError("unexpected end of typed AST")
+        return line.rstrip("\n\r")
+
+    def close(self) -> None:
+        if self.closer is not None:
+            self.closer()
+            self.closer = None
+
+    def __enter__(self) -> AstReader:
+        return self
+
+    def __exit__(self, *args) -> None:
+        self.close()
+
 
 # recursive approach to writing parsing results to ast
-def read_line(ast:List[str]) -> str:
-    return ast.pop()
+def read_line(ast:AstReader) -> str:
+    return ast.read_line()
+
+
+def read_name(ast:AstReader) -> str:
+    # identifiers and type names repeat constantly, so every node shares one interned copy
+    return sys.intern(ast.read_line())
+
+
+def read_lineno(ast:AstReader) -> int:
+    return int(ast.read_line())
 
 
-def read_list(ast:List[str], elem_fn:Callable[[List[str]], Any]) -> List[Any]:
+def read_list(ast:AstReader, elem_fn:Callable[[AstReader], Any]) -> List[Any]:
     # Follow the spec to read a generic list
     list = []
     for _ in range(int(read_line(ast))):
@@ -18,14 +84,29 @@ def read_list(ast:List[str], elem_fn:Callable[[List[str]], Any]) -> List[Any]:
     return list
         
 
-def read_identifier(ast:List[str]) -> Identifier:
+def read_identifier(ast:AstReader) -> Identifier:
     # Follow the spec to read an identifier
-    lineno = read_line(ast)
-    name = read_line(ast)
+    lineno = read_lineno(ast)
+    name = read_name(ast)
     return Identifier(lineno, name)
     
 
-def read_let_binding(ast:List[str]) -> LetBinding:
+# Expression readers are generators: instead of recursing, they yield whenever they need a
+# sub-expression and read_expr sends the finished node back in. This keeps the native stack
+# flat no matter how deeply the AST is nested.
+ExprSteps = Generator[None, Expression, Expression]
+
+
+def read_expr_list(ast:AstReader) -> Generator[None, Expression, List[Expression]]:
+    # Follow the spec to read a list of expressions
+    list = []
+    for _ in range(int(read_line(ast))):
+        list.append((yield))
+
+    return list
+
+
+def read_let_binding(ast:AstReader) -> Generator[None, Expression, LetBinding]:
     # Follow the spec to read a single let binding
     # Used when we write a let expression
     binding_type = read_line(ast)
@@ -33,100 +114,124 @@ def read_let_binding(ast:List[str]) -> LetBinding:
     var_type = read_identifier(ast)
     init_expr = None
     if binding_type == "let_binding_init":
-        init_expr = read_expr(ast)
+        init_expr = yield
     return LetBinding(variable, var_type, init_expr)
 
 
-def read_case_element(ast:List[str]) -> CaseElement:
+def read_case_element(ast:AstReader) -> Generator[None, Expression, CaseElement]:
     # Follow the spec to read a case element
     # Used when we write a case expression
     formal = read_formal(ast)
-    expr = read_expr(ast)
+    expr = yield
     return CaseElement(formal, expr)
 
 
-def read_expr(ast:List[str]) -> Expression:
+def read_expr(ast:AstReader) -> Expression:
+    # drive the expression readers with an explicit stack rather than the call stack
+    stack:List[ExprSteps] = [read_expr_steps(ast)]
+    node = None
+    while stack:
+        try:
+            stack[-1].send(node)
+        except StopIteration as done:
+            stack.pop()
+            node = done.value
+            continue
+
+        # the reader on top of the stack is waiting on a sub-expression
+        stack.append(read_expr_steps(ast))
+        node = None
+
+    return node
+
+
+def read_expr_steps(ast:AstReader) -> ExprSteps:
     # Determine type of expression printing style and call the appropriate function
-    lineno = read_line(ast)
-    expr_type = read_line(ast)
+    lineno = read_lineno(ast)
+    expr_type = read_name(ast)
     expr_name = read_line(ast)
     if expr_name == "assign":
         var = read_identifier(ast)
-        rhs = read_expr(ast)
+        rhs = yield
         return Assign(lineno, var, rhs, expr_type)
     elif expr_name == "dynamic_dispatch":
-        obj = read_expr(ast)
+        obj = yield
         method_name = read_identifier(ast)
-        args = read_list(ast, read_expr)
+        args = yield from read_expr_list(ast)
         return DynamicDispatch(lineno, obj, method_name, args, expr_type)
     elif expr_name == "static_dispatch":
-        obj = read_expr(ast)
+        obj = yield
         class_type = read_identifier(ast)
         method_name = read_identifier(ast)
-        args = read_list(ast, read_expr)
+        args = yield from read_expr_list(ast)
         return StaticDispatch(lineno, obj, class_type, method_name, args, expr_type)
     elif expr_name == "self_dispatch":
         method_name = read_identifier(ast)
-        args = read_list(ast, read_expr)
+        args = yield from read_expr_list(ast)
         return SelfDispatch(lineno, method_name, args, expr_type)
     elif expr_name == 'if':
-        condition = read_expr(ast)
-        then_body = read_expr(ast)
-        else_body = read_expr(ast)
+        condition = yield
+        then_body = yield
+        else_body = yield
         return If(lineno, condition, then_body, else_body, expr_type)
     elif expr_name == 'while':
-        condition = read_expr(ast)
-        while_body = read_expr(ast)
+        condition = yield
+        while_body = yield
         return While(lineno, condition, while_body, expr_type)
     elif expr_name == 'block':
-        return Block(lineno, read_list(ast, read_expr), expr_type)
+        body = yield from read_expr_list(ast)
+        return Block(lineno, body, expr_type)
     elif expr_name == 'new':
         class_name = read_identifier(ast)
         return New(lineno, class_name, expr_type)
     elif expr_name == 'isvoid':
-        rhs = read_expr(ast)
+        rhs = yield
         return IsVoid(lineno, rhs, expr_type)
     elif expr_name == 'plus':
-        lhs = read_expr(ast)
-        rhs = read_expr(ast)
+        lhs = yield
+        rhs = yield
         return Plus(lineno, lhs, rhs, expr_type)
     elif expr_name == 'minus':
-        lhs = read_expr(ast)
-        rhs = read_expr(ast)
+        lhs = yield
+        rhs = yield
         return Minus(lineno, lhs, rhs, expr_type)
     elif expr_name == 'times':
-        lhs = read_expr(ast)
-        rhs = read_expr(ast)
+        lhs = yield
+        rhs = yield
         return Times(lineno, lhs, rhs, expr_type)
     elif expr_name == 'divide':
-        lhs = read_expr(ast)
-        rhs = read_expr(ast)
+        lhs = yield
+        rhs = yield
         return Divide(lineno, lhs, rhs, expr_type)
     elif expr_name == 'lt':
-        lhs = read_expr(ast)
-        rhs = read_expr(ast)
+        lhs = yield
+        rhs = yield
         return Lt(lineno, lhs, rhs, expr_type)
     elif expr_name == 'le':
-        lhs = read_expr(ast)
-        rhs = read_expr(ast)
+        lhs = yield
+        rhs = yield
         return Le(lineno, lhs, rhs, expr_type)
     elif expr_name == 'eq':
-        lhs = read_expr(ast)
-        rhs = read_expr(ast)
+        lhs = yield
+        rhs = yield
         return Eq(lineno, lhs, rhs, expr_type)
     elif expr_name == 'not':
-        rhs = read_expr(ast)
+        rhs = yield
         return Not(lineno, rhs, expr_type)
     elif expr_name == 'negate':
-        rhs = read_expr(ast)
+        rhs = yield
         return Negate(lineno, rhs, expr_type)
     elif expr_name == "let":
-        binding_list = read_list(ast, read_let_binding)
-        let_expr = read_expr(ast)
+        binding_list = []
+        for _ in range(int(read_line(ast))):
+            binding_list.append((yield from read_let_binding(ast)))
+        let_expr = yield
         return Let(lineno, binding_list, let_expr, expr_type)
     elif expr_name == "case":
-        case_expr = read_expr(ast)
-        case_list = read_list(ast, read_case_element)
+        case_expr = yield
+        case_list = []
+        for _ in range(int(read_line(ast))):
+            case_list.append((yield from read_case_element(ast)))
         return Case(lineno, case_expr, case_list, expr_type)
     elif expr_name == "integer":
         return Integer(lineno, read_line(ast), expr_type)
@@ -135,12 +240,12 @@ def read_expr(ast:List[str]) -> Expression:
     elif expr_name == "identifier":
         return Variable(lineno, read_identifier(ast), expr_type)
     elif expr_name == "true" or expr_name == "false":
-        return Bool(lineno, expr_name, expr_type)
+        return Bool(lineno, sys.intern(expr_name), expr_type)
     elif expr_name == "internal":
-        return Internal(expr_type, read_line(ast))
+        return Internal(expr_type, read_name(ast))
 
 
-def read_feature(ast:List[str]) -> Feature:
+def read_feature(ast:AstReader) -> Feature:
     # Follow the spec to read a feature
     feature_type = read_line(ast)
     feature_name = read_identifier(ast)
@@ -159,14 +264,14 @@ def read_feature(ast:List[str]) -> Feature:
         return Method(feature_name, return_type, formal_list, feature_expr)
 
 
-def read_formal(ast) -> Formal:
+def read_formal(ast:AstReader) -> Formal:
     # Follow the spec to read a formal
     name = read_identifier(ast)
     formal_type = read_identifier(ast)
     return Formal(name, formal_type)
 
 
-def read_class(ast:List[str]) -> Class:
+def read_class(ast:AstReader) -> Class:
     # Follow the spec to read a class
     class_name = read_identifier(ast)
     inherit_status = read_line(ast)
@@ -179,10 +284,10 @@ def read_class(ast:List[str]) -> Class:
     return Class(class_name, pred, feature_list)
 
 
-def read_class_attribute(ast:List[str]) -> ClassAttribute:
-    attribute_kind = read_line(ast)
-    attribute_name = read_line(ast)
-    attribute_type = read_line(ast)
+def read_class_attribute(ast:AstReader) -> ClassAttribute:
+    attribute_kind = read_name(ast)
+    attribute_name = read_name(ast)
+    attribute_type = read_name(ast)
     attribute_expr = None
 
     if attribute_kind == "initializer":
@@ -191,50 +296,124 @@ def read_class_attribute(ast:List[str]) -> ClassAttribute:
     return ClassAttribute(attribute_name, attribute_kind, attribute_type, attribute_expr)
 
 
-def read_impl_method(ast:List[str]) -> ImplMethod:
-    class_name = read_line(ast)
-    formal_list = read_list(ast, read_line)
-    method_parent = read_line(ast)
+def read_impl_method(ast:AstReader, shared_methods:Dict[Tuple[str, str], ImplMethod]=None) -> ImplMethod:
+    class_name = read_name(ast)
+    formal_list = read_list(ast, read_name)
+    method_parent = read_name(ast)
+
+    # every class repeats the full body of each method it inherits, only the first copy is built
+    if shared_methods is not None:
+        shared_method = shared_methods.get((method_parent, class_name))
+        if shared_method is not None:
+            skip_expr(ast)
+            return shared_method
+
     method_expr = read_expr(ast)
-    return ImplMethod(class_name, formal_list, method_parent, method_expr)
+    method = ImplMethod(class_name, formal_list, method_parent, method_expr)
+    if shared_methods is not None:
+        shared_methods[(method_parent, class_name)] = method
+    return method
+
+
+# lines that follow the three header lines of each kind of expression, used to skip over expressions
+# without building them: "line" is a single line, "expr" a nested expression, and the plural steps
+# a count followed by that many elements
+SKIP_STEPS:Dict[str, List[str]] = {
+    "assign": ["line", "line", "expr"],
+    "dynamic_dispatch": ["expr", "line", "line", "exprs"],
+    "static_dispatch": ["expr", "line", "line", "line", "line", "exprs"],
+    "self_dispatch": ["line", "line", "exprs"],
+    "if": ["expr", "expr", "expr"],
+    "while": ["expr", "expr"],
+    "block": ["exprs"],
+    "new": ["line", "line"],
+    "isvoid": ["expr"],
+    "plus": ["expr", "expr"],
+    "minus": ["expr", "expr"],
+    "times": ["expr", "expr"],
+    "divide": ["expr", "expr"],
+    "lt": ["expr", "expr"],
+    "le": ["expr", "expr"],
+    "eq": ["expr", "expr"],
+    "not": ["expr"],
+    "negate": ["expr"],
+    "let": ["let_bindings", "expr"],
+    "case": ["expr", "case_elements"],
+    "integer": ["line"],
+    "string": ["line"],
+    "identifier": ["line", "line"],
+    "true": [],
+    "false": [],
+    "internal": ["line"],
+}
+
+
+def skip_expr(ast:AstReader) -> None:
+    # consume one serialized expression without creating any nodes
+    pending = ["expr"]
+    while pending:
+        step = pending.pop()
+        if step == "line":
+            read_line(ast)
+        elif step == "expr":
+            read_line(ast)
+            read_line(ast)
+            pending.extend(reversed(SKIP_STEPS[read_line(ast)]))
+        elif step == "exprs":
+            pending.extend(["expr"] * int(read_line(ast)))
+        elif step == "let_bindings":
+            pending.extend(["let_binding"] * int(read_line(ast)))
+        elif step == "let_binding":
+            has_init = read_line(ast) == "let_binding_init"
+            for _ in range(4):
+                read_line(ast)
+            if has_init:
+                pending.append("expr")
+        elif step == "case_elements":
+            pending.extend(["case_element"] * int(read_line(ast)))
+        elif step == "case_element":
+            for _ in range(4):
+                read_line(ast)
+            pending.append("expr")
     
 
-def read_class_map_entry(ast:List[str]) -> ClassMapEntry:
-    class_name = read_line(ast)
+def read_class_map_entry(ast:AstReader) -> ClassMapEntry:
+    class_name = read_name(ast)
     attr_list = read_list(ast, read_class_attribute)
     return ClassMapEntry(class_name, attr_list)
 
 
-def read_impl_map_entry(ast:List[str]) -> ImplMapEntry:
-    class_name = read_line(ast)
-    method_list = read_list(ast, read_impl_method)
+def read_impl_map_entry(ast:AstReader, shared_methods:Dict[Tuple[str, str], ImplMethod]=None) -> ImplMapEntry:
+    class_name = read_name(ast)
+    method_list = read_list(ast, lambda ast: read_impl_method(ast, shared_methods))
     return ImplMapEntry(class_name, method_list)
 
 
-def read_parent_map_entry(ast:List[str]) -> ParentMapEntry:
-    child = read_line(ast)
-    parent = read_line(ast)
+def read_parent_map_entry(ast:AstReader) -> ParentMapEntry:
+    child = read_name(ast)
+    parent = read_name(ast)
     return ParentMapEntry(parent, child)
 
 
-def read_ast(ast:List[str]) -> Tuple[List[ClassMapEntry], List[ImplMapEntry], List[ParentMapEntry], List[Class]]:
+def read_ast(ast:AstReader, selective:bool=False) -> Tuple[List[ClassMapEntry], List[ImplMapEntry], List[ParentMapEntry], List[Class]]:
     # Follow the spec to read a program
+    # In selective mode inherited methods share a single ImplMethod with their defining class and the
+    # annotated AST, which code generation never looks at, is left unread (an empty list is returned)
+    shared_methods = {} if selective else None
     read_line(ast)
     class_map = read_list(ast, read_class_map_entry)
     read_line(ast)
-    impl_map = read_list(ast, read_impl_map_entry)
+    impl_map = read_list(ast, lambda ast: read_impl_map_entry(ast, shared_methods))
     read_line(ast)
     parent_map = read_list(ast, read_parent_map_entry)
-    annotated_ast = read_list(ast, read_class)
+    annotated_ast = read_list(ast, read_class) if not selective else []
 
     return class_map, impl_map, parent_map, annotated_ast
 
 
 def main(argv):
-    with open(argv[1], 'r') as file:
-        ast_lines = [line.strip("\n\r") for line in reversed(file.readlines())]
-
-    class_map, impl_map, parent_map, class_list = read_ast(ast_lines)
+    with AstReader.from_file(argv[1]) as ast:
+        class_map, impl_map, parent_map, class_list = read_ast(ast)
     with open(argv[1][:-8], "w") as file:
         file.write(f"class_map\n{len(class_map)}\n")
         for elem in class_map:
@@ -1,31 +1,187 @@
 from collections import defaultdict
 from deserialize import *
 from coolast import *
-from tac import Tac
-from cfg import CFG
-from codegen import CodeGen
+from compiler import compile_maps, compile_maps_streaming
+from astcache import AstCache
+from asmcache import AsmCache
+from passtimer import PassTimer
+from typing import List, Tuple
+import argparse
+import multiprocessing
+import os
 import sys
+import time
 
 
-def main(argv):
-    sys.setrecursionlimit(10000)
-    cl_type_file = argv[1]
-    with open(cl_type_file, 'r') as file:
-        ast_lines = [line.rstrip("\n\r") for line in reversed(file.readlines())]
-
-    class_map, impl_map, parent_map, _ = read_ast(ast_lines)
-    tac = Tac(class_map, impl_map, parent_map)
-    tac.tacgen()
-    cfg = CFG(tac.get_tacfuncs())
-    cfg.calc_interference()
-    cfg.optimize()
-    #cfg.debug_cfg()
-    cfg.alloc_regs()
-    cfg.resolve_stack_discipline()
-    cgen = CodeGen(impl_map, cfg.to_tacfuncs())
+def load_program(cl_type_file:str, cache:AstCache=None, timer:PassTimer=None):
+    timer = timer if timer is not None else PassTimer()
+    if cache is not None:
+        with timer.phase("ast_cache_load"):
+            key = cache.key(cl_type_file)
+            maps = cache.load(key)
+        if maps is not None:
+            return maps
+
+    with timer.phase("read_ast"), AstReader.from_file(cl_type_file) as ast:
+        class_map, impl_map, parent_map, _ = read_ast(ast, selective=True)
+
+    if cache is not None:
+        cache.store(key, (class_map, impl_map, parent_map))
+    return class_map, impl_map, parent_map
 
+
+def compile_file(cl_type_file:str, cache:AstCache=None, backend_jobs:int=None, timer:PassTimer=None,
+        asm_cache:AsmCache=None, stream:bool=False, opt_level:int=1) -> None:
+    timer = timer if timer is not None else PassTimer()
+    maps = load_program(cl_type_file, cache, timer)
+    if stream:
+        # functions are written as they are generated, so build the output under a temporary name and only
+        # move it into place once every function made it, a failed compile must not leave a truncated .s behind
+        asm_file = cl_type_file[:-8] + ".s"
+        temp_file = f"{asm_file}.{os.getpid()}.tmp"
+        try:
+            with timer.phase("streaming_backend"), open(temp_file, "w") as file:
+                compile_maps_streaming(*maps, file, opt_level)
+            os.replace(temp_file, asm_file)
+        finally:
+            if os.path.exists(temp_file):
+                os.remove(temp_file)
+        return
+
+    asm = compile_maps(*maps, backend_jobs, timer, asm_cache, opt_level)
     with open(cl_type_file[:-8] + ".s", "w") as file:
-        file.write(cgen.gen_x86())
+        file.write(asm)
+
+
+def compile_job(job:Tuple[str, str, int, str, int, bool, int]):
+    # runs inside a pool worker: failures are reported back instead of raised so one bad input
+    # never stops the rest of the batch
+    cl_type_file, cache_dir, cache_max_bytes, asm_cache_dir, asm_cache_max_bytes, stream, opt_level = job
+    start = time.perf_counter()
+    cache = AstCache(cache_dir, cache_max_bytes) if cache_dir is not None else None
+    asm_cache = AsmCache(asm_cache_dir, asm_cache_max_bytes) if asm_cache_dir is not None else None
+    error = None
+    try:
+        compile_file(cl_type_file, cache, asm_cache=asm_cache, stream=stream, opt_level=opt_level)
+    except Exception as e:
+        error = f"{type(e).__name__}: {e}"
+    return (cl_type_file, error, time.perf_counter() - start, cache.stats if cache is not None else {},
+            asm_cache.stats if asm_cache is not None else {})
+
+
+def compile_batch(cl_type_files:List[str], jobs:int, cache:AstCache=None, asm_cache:AsmCache=None, stream:bool=False,
+        opt_level:int=1) -> bool:
+    start = time.perf_counter()
+    failures = 0
+    cache_dir = cache.cache_dir if cache is not None else None
+    cache_max_bytes = cache.max_bytes if cache is not None else None
+    asm_cache_dir = asm_cache.cache_dir if asm_cache is not None else None
+    asm_cache_max_bytes = asm_cache.max_bytes if asm_cache is not None else None
+
+    with multiprocessing.Pool(jobs) as pool:
+        job_list = [
+            (cl_type_file, cache_dir, cache_max_bytes, asm_cache_dir, asm_cache_max_bytes, stream, opt_level)
+            for cl_type_file in cl_type_files
+        ]
+        for cl_type_file, error, elapsed, cache_stats, asm_cache_stats in pool.imap_unordered(compile_job, job_list):
+            if error is None:
+                print(f"OK    {elapsed:7.2f}s  {cl_type_file}")
+            else:
+                failures += 1
+                print(f"FAIL  {elapsed:7.2f}s  {cl_type_file}: {error}")
+            for shared_cache, stats in ((cache, cache_stats), (asm_cache, asm_cache_stats)):
+                if shared_cache is not None:
+                    for name, count in stats.items():
+                        shared_cache.stats[name] += count
+
+    print(f"{len(cl_type_files) - failures} succeeded, {failures} failed in {time.perf_counter() - start:.2f}s")
+    return failures == 0
+
+
+def read_manifest(manifest:str) -> List[str]:
+    # one .cl-type path per line, blank lines and lines starting with # are ignored
+    with open(manifest, 'r') as file:
+        return [line.strip() for line in file if line.strip() and not line.lstrip().startswith("#")]
+
+
+def parse_args(argv):
+    parser = argparse.ArgumentParser(prog=argv[0], description="COOL code generator")
+    parser.add_argument("cl_type_files", nargs="*", metavar="cl_type_file",
+                        help="type-checked program (.cl-type) to compile")
+    parser.add_argument("--manifest", metavar="FILE",
+                        help="file listing additional .cl-type inputs, one per line")
+    parser.add_argument("-j", "--jobs", type=int, default=None, metavar="N",
+                        help="compile inputs in parallel on N processes (default: one per CPU)")
+    parser.add_argument("--backend-jobs", type=int, default=None, metavar="N",
+                        help="shard a single input by class and run tac, the cfg passes, and codegen on N processes")
+    parser.add_argument("-O", dest="opt_level", type=int, choices=[0, 1], default=1, metavar="LEVEL",
+                        help="-O0 emits straight from tac with a stack slot per value for the fastest compile, "
+                             "-O1 (default) optimizes and allocates registers")
+    parser.add_argument("--stream", action="store_true",
+                        help="take one function at a time from tac to the output file, bounding memory by the largest method")
+    parser.add_argument("--time-passes", action="store_true",
+                        help="report wall and cpu time of every compiler phase to stderr")
+    parser.add_argument("--mem-passes", action="store_true",
+                        help="report the tracemalloc peak of every compiler phase to stderr")
+    parser.add_argument("--pass-report-format", choices=["text", "json"], default="text",
+                        help="format of the --time-passes/--mem-passes/--pass-stats report")
+    parser.add_argument("--profile-passes", metavar="DIR",
+                        help="write a cProfile dump of every top level phase to DIR/<phase>.prof")
+    parser.add_argument("--pass-stats", action="store_true",
+                        help="report per method counts of the void checks and other code the optimizer removed to stderr")
+    parser.add_argument("--ast-cache", metavar="DIR",
+                        help="reuse deserialized maps cached in DIR across compiles")
+    parser.add_argument("--ast-cache-max-mb", type=int, default=256, metavar="MB",
+                        help="evict least recently used cache entries beyond this size")
+    parser.add_argument("--asm-cache", metavar="DIR",
+                        help="compile incrementally, reusing the assembly of unchanged functions cached in DIR")
+    parser.add_argument("--asm-cache-max-mb", type=int, default=256, metavar="MB",
+                        help="evict least recently used function entries beyond this size")
+    parser.add_argument("--cache-stats", action="store_true",
+                        help="print cumulative cache hit/miss statistics to stderr")
+    args = parser.parse_args(argv[1:])
+
+    if args.manifest is not None:
+        args.cl_type_files += read_manifest(args.manifest)
+    if not args.cl_type_files:
+        parser.error("no input files")
+    if args.backend_jobs is not None and (len(args.cl_type_files) > 1 or args.jobs is not None):
+        # pool workers cannot start pools of their own
+        parser.error("--backend-jobs only applies to a single input compiled without -j")
+    if sum([args.backend_jobs is not None, args.asm_cache is not None, args.stream]) > 1:
+        parser.error("only one of --backend-jobs, --asm-cache, and --stream can be used")
+    if (args.time_passes or args.mem_passes or args.profile_passes or args.pass_stats) and (len(args.cl_type_files) > 1 or args.jobs is not None):
+        parser.error("pass instrumentation only applies to a single input compiled without -j")
+    if args.pass_stats and (args.opt_level == 0 or args.backend_jobs is not None or args.asm_cache is not None or args.stream):
+        # the other backends run the passes in workers, per function, or not at all
+        parser.error("--pass-stats only applies to the -O1 whole program backend")
+    return args
+
+
+def main(argv):
+    args = parse_args(argv)
+    cache = AstCache(args.ast_cache, args.ast_cache_max_mb * 1024 * 1024) if args.ast_cache else None
+    asm_cache = AsmCache(args.asm_cache, args.asm_cache_max_mb * 1024 * 1024) if args.asm_cache else None
+
+    timer = PassTimer(args.time_passes, args.mem_passes, args.profile_passes, args.pass_stats)
+
+    ok = True
+    if len(args.cl_type_files) == 1 and args.jobs is None:
+        compile_file(args.cl_type_files[0], cache, args.backend_jobs, timer, asm_cache, args.stream, args.opt_level)
+        if args.time_passes or args.mem_passes or args.pass_stats:
+            report = timer.report_json() if args.pass_report_format == "json" else timer.report_text()
+            print(report, end="", file=sys.stderr)
+    else:
+        ok = compile_batch(args.cl_type_files, args.jobs or os.cpu_count(), cache, asm_cache, args.stream, args.opt_level)
+
+    for label, shared_cache in (("ast cache", cache), ("asm cache", asm_cache)):
+        if shared_cache is not None:
+            totals = shared_cache.save_stats()
+            if args.cache_stats:
+                print(f"{label}: " + " ".join(f"{name}={count}" for name, count in totals.items()), file=sys.stderr)
+
+    if not ok:
+        sys.exit(1)
 
 if __name__ == '__main__':
     main(sys.argv)
@@ -104,7 +104,8 @@ class FixedRegisterAllocator(object):
         return self.tac_reg_map[treg] if treg in self.tac_reg_map else None
 
     def get_used_callee_regs(self) -> list[PReg]:
-        return list(self.used_callee_regs)
+        # keep the push order fixed, iterating the set would depend on the per-process string hash seed
+        return [reg for reg in self.callee_saved if reg in self.used_callee_regs]
 
 
 class ConstantPropogator(object):
@@ -164,7 +165,7 @@ class ConstantPropogator(object):
         if dest in self.constants and isinstance(self.constants[dest], self.TOP):
             return
 
-        if isinstance(tacinst, TacLoadImm) and not isinstance(tacinst.imm, TacImmLabel):
+        if isinstance(tacinst, TacLoadImm) and not isinstance(tacinst.imm, (TacImmLabel, TacConstObj)):
             self.constants[dest] = tacinst.imm.val
             return
         elif isinstance(tacinst, TacLoadStr):
@@ -194,9 +195,18 @@ class ConstantPropogator(object):
                 add_value(dest, -self.constants[tacinst.src])
             elif isinstance(tacinst, TacNot):
                 add_value(dest, 1 if self.constants[tacinst.src] == 0 else 0)
+        elif isinstance(tacinst, TacIcmp):
+            lhs, rhs = self.constants[tacinst.src1], self.constants[tacinst.src2]
+            if tacinst.icmp_op == TacCmpOp.EQ:
+                add_value(dest, int(lhs == rhs))
+            elif tacinst.icmp_op == TacCmpOp.NE:
+                add_value(dest, int(lhs != rhs))
+            elif tacinst.icmp_op == TacCmpOp.LT:
+                add_value(dest, int(lhs < rhs))
+            elif tacinst.icmp_op == TacCmpOp.LE:
+                add_value(dest, int(lhs <= rhs))
         elif isinstance(tacinst, TacCreate):
             if tacinst.object == "Bool" or tacinst.object == "Int":
-                print(dest)
                 self.constants[dest] = 0
             elif tacinst.object == "String":
                 self.constants[dest] = ""
@@ -254,4 +264,157 @@ class DeadCodeEliminator(object):
     def optimize_block(self, cfg: CFGBlock) -> bool:
         old_length = len(cfg.inst_list)
         cfg.inst_list[:] = [inst for inst in cfg.inst_list if isinstance(inst, (TacAlloc, TacCall, TacSyscall)) or inst.get_dest_operand() is None or inst.get_dest_operand() in inst.live_out]
-        return len(cfg.inst_list) != old_length
\ No newline at end of file
+        return len(cfg.inst_list) != old_length
+
+
+class NullCheckEliminator(object):
+    """
+    Removes dispatch on void and case on void checks whose receiver is provably non-void
+    A forward must analysis tracks which registers and stack slots hold non-void objects: results of new, self,
+    constant objects, slots stored from those, and anything on the non-void side of an earlier check
+    A check is a cmp against zero followed by a branch whose void side is an error block ending in a trap,
+    proven checks become plain jumps and the error blocks left without predecessors are dropped
+    """
+    def __init__(self, cfg_func: CFGFunc):
+        self.cfg_func = cfg_func
+        self.zero_regs: Set[TacReg] = {
+            inst.dest for cfg in cfg_func.cfg_blocks for inst in cfg.inst_list
+            if isinstance(inst, TacLoadImm) and type(inst.imm) is TacImm and inst.imm.val == 0
+        }
+        self.nonvoid_out: Dict[CFGBlock, Optional[Set[TacReg]]] = {cfg: None for cfg in cfg_func.cfg_blocks}
+        self.loaded_from: Dict[CFGBlock, Dict[TacReg, TacReg]] = {}
+        self.removed = 0
+
+    def optimize(self) -> int:
+        changed = True
+        while changed:
+            changed = False
+            for cfg in self.cfg_func.cfg_blocks:
+                incoming = self.block_in(cfg)
+                if incoming is None:
+                    continue
+                nonvoid = self.transfer(cfg, incoming)
+                if nonvoid != self.nonvoid_out[cfg]:
+                    self.nonvoid_out[cfg] = nonvoid
+                    changed = True
+
+        for cfg in self.cfg_func.cfg_blocks:
+            self.remove_check(cfg)
+        self.remove_unreachable_blocks()
+        return self.removed
+
+    def get_check(self, cfg: CFGBlock) -> Optional[Tuple[TacReg, CFGBlock, CFGBlock]]:
+        # (checked register, block taken when it is not void, block taken when it is), or None if cfg does not end in a check
+        if len(cfg.inst_list) < 2 or not isinstance(cfg.inst_list[-2], TacCmp):
+            return None
+        cmp, br = cfg.inst_list[-2], cfg.inst_list[-1]
+        if not isinstance(br, TacBr) or br.cond not in (TacCmpOp.EQ, TacCmpOp.NE) or cmp.width != 64:
+            return None
+
+        if cmp.src1 in self.zero_regs:
+            checked = cmp.src2
+        elif cmp.src2 in self.zero_regs:
+            checked = cmp.src1
+        else:
+            return None
+
+        true_block = self.cfg_func.cfg_map.get(str(br.true_label.num))
+        false_block = self.cfg_func.cfg_map.get(str(br.false_label.num))
+        if true_block is None or false_block is None:
+            return None
+        if br.cond == TacCmpOp.NE:
+            return checked, true_block, false_block
+        return checked, false_block, true_block
+
+    def block_in(self, cfg: CFGBlock) -> Optional[Set[TacReg]]:
+        # None until some predecessor has been visited
+        if not cfg.preds:
+            return set()
+
+        incoming: Optional[Set[TacReg]] = None
+        for pred in cfg.preds:
+            pred_out = self.nonvoid_out[pred]
+            if pred_out is None:
+                # not visited yet, it cannot rule anything out
+                continue
+            pred_out = set(pred_out)
+            check = self.get_check(pred)
+            if check is not None and check[1] is cfg and check[1] is not check[2]:
+                checked = check[0]
+                pred_out.add(checked)
+                if checked in self.loaded_from[pred]:
+                    pred_out.add(self.loaded_from[pred][checked])
+            incoming = pred_out if incoming is None else incoming & pred_out
+
+        return incoming
+
+    def transfer(self, cfg: CFGBlock, nonvoid: Set[TacReg]) -> Set[TacReg]:
+        # loaded_from remembers which slot a register was read from, so a check on the register also proves the slot
+        loaded_from: Dict[TacReg, TacReg] = {}
+        for inst in cfg.inst_list:
+            if isinstance(inst, TacStore):
+                if inst.offset is None:
+                    if inst.src in nonvoid:
+                        nonvoid.add(inst.dest)
+                    else:
+                        nonvoid.discard(inst.dest)
+                    loaded_from = {reg: slot for reg, slot in loaded_from.items() if slot != inst.dest}
+                continue
+
+            dest = inst.get_dest_operand()
+            if dest is None:
+                continue
+            loaded_from.pop(dest, None)
+
+            if isinstance(inst, (TacCreate, TacStoreSelf)):
+                nonvoid.add(dest)
+            elif isinstance(inst, TacSyscall) and inst.func == "calloc@PLT":
+                # an object built in place by an inlined constructor, trusted not to fail just like c..new's own calloc
+                nonvoid.add(dest)
+            elif isinstance(inst, TacLoadImm) and isinstance(inst.imm, (TacImmLabel, TacConstObj)):
+                nonvoid.add(dest)
+            elif isinstance(inst, TacAdd) and inst.src1 in nonvoid:
+                # a pointer plus an offset, how Tac picks one of the Bool singletons
+                nonvoid.add(dest)
+            elif isinstance(inst, TacLoad) and inst.offset is None:
+                loaded_from[dest] = inst.src
+                if inst.src in nonvoid:
+                    nonvoid.add(dest)
+                else:
+                    nonvoid.discard(dest)
+            else:
+                nonvoid.discard(dest)
+
+        self.loaded_from[cfg] = loaded_from
+        return nonvoid
+
+    def remove_check(self, cfg: CFGBlock) -> None:
+        check = self.get_check(cfg)
+        if check is None:
+            return
+        checked, nonvoid_block, void_block = check
+        nonvoid = self.nonvoid_out[cfg]
+        if nonvoid_block is void_block or nonvoid is None or checked not in nonvoid:
+            return
+        # only void checks guarding an error block are removed, user written isvoid tests are left alone
+        if not void_block.inst_list or not isinstance(void_block.inst_list[-1], TacTrap):
+            return
+
+        cfg.inst_list[-2:] = [TacBr(true_label=nonvoid_block.inst_list[0])]
+        cfg.succs.remove(void_block)
+        void_block.preds.remove(cfg)
+        self.removed += 1
+
+    def remove_unreachable_blocks(self) -> None:
+        changed = True
+        while changed:
+            changed = False
+            for cfg in self.cfg_func.cfg_blocks[1:]:
+                if cfg.preds:
+                    continue
+                for succ in cfg.succs:
+                    succ.preds.remove(cfg)
+                self.cfg_func.cfg_blocks.remove(cfg)
+                del self.cfg_func.cfg_map[cfg.name]
+                changed = True
+                break
@@ -0,0 +1,132 @@
+from __future__ import annotations
+import cProfile
+import json
+import os
+import time
+import tracemalloc
+from contextlib import contextmanager
+from typing import List, Dict, Any, Iterator
+
+__all__ = ["PassTimer", "PassRecord"]
+
+
+class PassRecord(object):
+    __slots__ = ("name", "depth", "wall", "cpu", "peak")
+
+    def __init__(self, name:str, depth:int):
+        self.name = name
+        self.depth = depth
+        self.wall = 0.0
+        self.cpu = 0.0
+        self.peak = 0
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {"name": self.name, "depth": self.depth, "wall": self.wall, "cpu": self.cpu, "peak": self.peak}
+
+
+class PassTimer(object):
+    """
+    Records wall time, cpu time, and optionally the tracemalloc peak of every compiler phase
+    Phases nest, so the passes inside CFG.optimize show up underneath it in the report
+    With pass_stats, optimization passes also report per function counts of what they removed
+    A timer with nothing enabled does no work, so callers can always pass one in
+    """
+    def __init__(self, time_passes:bool=False, mem_passes:bool=False, profile_dir:str=None, pass_stats:bool=False):
+        self.time_passes = time_passes
+        self.mem_passes = mem_passes
+        self.profile_dir = profile_dir
+        self.pass_stats = pass_stats
+        self.records:List[PassRecord] = []
+        self.stack:List[PassRecord] = []
+        self.stats:Dict[str, Dict[str, int]] = {}
+
+        if profile_dir is not None:
+            os.makedirs(profile_dir, exist_ok=True)
+        if mem_passes and not tracemalloc.is_tracing():
+            tracemalloc.start()
+
+    def enabled(self) -> bool:
+        return self.time_passes or self.mem_passes or self.profile_dir is not None
+
+    @contextmanager
+    def phase(self, name:str) -> Iterator[None]:
+        if not self.enabled():
+            yield
+            return
+
+        record = PassRecord(name, len(self.stack))
+        self.records.append(record)
+        if self.mem_passes:
+            # tracemalloc has one peak counter, fold it into the enclosing phase before reusing it
+            if self.stack:
+                self.stack[-1].peak = max(self.stack[-1].peak, tracemalloc.get_traced_memory()[1])
+            tracemalloc.reset_peak()
+
+        # only one profiler can be active at a time, so nested passes are covered by their outer phase's profile
+        profiler = cProfile.Profile() if self.profile_dir is not None and not self.stack else None
+        self.stack.append(record)
+        if profiler is not None:
+            profiler.enable()
+        wall_start = time.perf_counter()
+        cpu_start = time.process_time()
+        try:
+            yield
+        finally:
+            record.wall = time.perf_counter() - wall_start
+            record.cpu = time.process_time() - cpu_start
+            if profiler is not None:
+                profiler.disable()
+                profiler.dump_stats(os.path.join(self.profile_dir, f"{name}.prof"))
+            self.stack.pop()
+
+            if self.mem_passes:
+                record.peak = max(record.peak, tracemalloc.get_traced_memory()[1])
+                tracemalloc.reset_peak()
+                if self.stack:
+                    self.stack[-1].peak = max(self.stack[-1].peak, record.peak)
+
+    def record_stat(self, pass_name:str, func_name:str, count:int) -> None:
+        if self.pass_stats:
+            func_counts = self.stats.setdefault(pass_name, {})
+            func_counts[func_name] = func_counts.get(func_name, 0) + count
+
+    def report_text(self) -> str:
+        lines:List[str] = []
+        if self.time_passes or self.mem_passes:
+            lines.extend(self.report_phases_text())
+        for pass_name, func_counts in self.stats.items():
+            lines.append(f"{pass_name:<48}{'removed':>10}")
+            for func_name, count in func_counts.items():
+                lines.append(f"{'  ' + func_name:<48}{count:>10}")
+            lines.append(f"{'total':<48}{sum(func_counts.values()):>10}")
+        return "\n".join(lines) + "\n"
+
+    def report_phases_text(self) -> List[str]:
+        header = f"{'phase':<32}"
+        if self.time_passes:
+            header += f"{'wall (s)':>10}{'cpu (s)':>10}"
+        if self.mem_passes:
+            header += f"{'peak (KiB)':>12}"
+        lines = [header]
+
+        for record in self.records:
+            line = f"{'  ' * record.depth + record.name:<32}"
+            if self.time_passes:
+                line += f"{record.wall:>10.4f}{record.cpu:>10.4f}"
+            if self.mem_passes:
+                line += f"{record.peak / 1024:>12.1f}"
+            lines.append(line)
+
+        if self.time_passes:
+            total_wall = sum(record.wall for record in self.records if record.depth == 0)
+            total_cpu = sum(record.cpu for record in self.records if record.depth == 0)
+            lines.append(f"{'total':<32}{total_wall:>10.4f}{total_cpu:>10.4f}")
+        return lines
+
+    def report_json(self) -> str:
+        return json.dumps({
+            "time_passes": self.time_passes,
+            "mem_passes": self.mem_passes,
+            "passes": [record.to_dict() for record in self.records],
+            "stats": self.stats,
+        }, indent=2) + "\n"
@@ -0,0 +1,197 @@
+from tacnodes import *
+from codegen import CodeGen
+from typing import List, Dict, Union
+
+
+class StackCodeGen(CodeGen):
+    """
+    -O0 backend that emits x86 straight from TacFunc.insts
+    Every TacReg lives in its own stack slot and each instruction loads its operands into scratch
+    registers, so there is no CFG, liveness, optimization, or register allocation, and nothing
+    has to be saved around calls
+    """
+    PARAM_REGS = ["%rdi", "%rsi", "%rdx", "%rcx", "%r8", "%r9"]
+
+    def __init__(self, impl_map:List[ImplMapEntry], tacfuncs:List[TacFunc]):
+        super().__init__(impl_map, tacfuncs)
+        self.slots:Dict[TacReg, str] = {}
+        self.frame_size = 0
+
+    def slot(self, treg:TacReg) -> str:
+        # slots are handed out on first use, the frame size is only known once the body is generated
+        if treg not in self.slots:
+            self.frame_size += 8
+            self.slots[treg] = f"-{self.frame_size}(%rbp)"
+        return self.slots[treg]
+
+    def gen_x86_tacfunc(self, asm:List[str], tacfunc:TacFunc):
+        self.slots.clear()
+        self.frame_size = 0
+
+        body:List[str] = []
+        for i, param in enumerate(tacfunc.params):
+            if i < len(self.PARAM_REGS):
+                body.append(f"\tmovq\t{self.PARAM_REGS[i]}, {self.slot(param)}\n")
+            else:
+                # the caller pushed the rest, they already sit above the return address
+                self.slots[param] = f"{16 + 8 * (i - len(self.PARAM_REGS))}(%rbp)"
+
+        hot_insts, cold_insts = self.split_cold_blocks(tacfunc.insts)
+        for i, inst in enumerate(hot_insts):
+            if isinstance(inst, TacBr):
+                self.gen_x86_branch(body, inst, hot_insts[i + 1] if i + 1 < len(hot_insts) else None)
+            else:
+                self.gen_x86_inst(body, inst)
+
+        asm.append("\t.text\n")
+        asm.append(f"\t.globl {tacfunc.name}\n")
+        asm.append(f"{tacfunc.name}:\n")
+        asm.append("\tpushq\t%rbp\n")
+        asm.append("\tmovq\t%rsp, %rbp\n")
+        # keep rsp 16 byte aligned for every call in the body
+        asm.append(f"\tsubq\t${(self.frame_size + 15) // 16 * 16}, %rsp\n")
+        asm.extend(body)
+        asm.append("\tmovq\t%rbp, %rsp\n")
+        asm.append("\tpopq\t%rbp\n")
+        asm.append("\tret\n\n")
+        self.gen_x86_cold_blocks(asm, cold_insts)
+
+    def gen_x86_inst(self, asm:List[str], inst:TacInst) -> str:
+        if isinstance(inst, TacLabel):
+            asm.append(f"{self.label_allocator.emit_label(inst)}:\n")
+        elif isinstance(inst, TacAlloc):
+            self.slot(inst.dest)
+        elif isinstance(inst, TacDeclare):
+            asm.append(f"\tmovq\t$0, {self.slot(inst.dest)}\n")
+        elif isinstance(inst, TacAdd):
+            asm.append(f"\tmovq\t{self.slot(inst.src2)}, %rax\n")
+            asm.append(f"\taddq\t{self.slot(inst.src1)}, %rax\n")
+            asm.append(f"\tmovq\t%rax, {self.slot(inst.dest)}\n")
+        elif isinstance(inst, TacSub):
+            asm.append(f"\tmovq\t{self.slot(inst.src1)}, %rax\n")
+            asm.append(f"\tsubq\t{self.slot(inst.src2)}, %rax\n")
+            asm.append(f"\tmovq\t%rax, {self.slot(inst.dest)}\n")
+        elif isinstance(inst, TacMul):
+            # slots are little endian, so the 32 bit operands below read the low half of the same address
+            asm.append(f"\tmovq\t{self.slot(inst.src2)}, %rax\n")
+            asm.append(f"\timull\t{self.slot(inst.src1)}, %eax\n")
+            asm.append(f"\tsalq\t$32, %rax\n")
+            asm.append(f"\tsarq\t$32, %rax\n")
+            asm.append(f"\tmovq\t%rax, {self.slot(inst.dest)}\n")
+        elif isinstance(inst, TacDiv):
+            asm.append(f"\tmovq\t{self.slot(inst.src1)}, %rax\n")
+            asm.append("\txor\t%edx, %edx\n")
+            asm.append("\tcdq\n")
+            asm.append(f"\tidivl\t{self.slot(inst.src2)}\n")
+            asm.append(f"\tmovq\t%rax, {self.slot(inst.dest)}\n")
+        elif isinstance(inst, TacLoad):
+            if inst.offset is None:
+                asm.append(f"\tmovq\t{self.slot(inst.src)}, %rax\n")
+            else:
+                asm.append(f"\tmovq\t{self.slot(inst.src)}, %r10\n")
+                asm.append(f"\tmovq\t{inst.offset*8}(%r10), %rax\n")
+            asm.append(f"\tmovq\t%rax, {self.slot(inst.dest)}\n")
+        elif isinstance(inst, TacStore):
+            asm.append(f"\tmovq\t{self.slot(inst.src)}, %rax\n")
+            if inst.offset is None:
+                asm.append(f"\tmovq\t%rax, {self.slot(inst.dest)}\n")
+            else:
+                asm.append(f"\tmovq\t{self.slot(inst.dest)}, %r10\n")
+                asm.append(f"\tmovq\t%rax, {inst.offset*8}(%r10)\n")
+        elif isinstance(inst, TacLoadPrim):
+            asm.append(f"\tmovq\t{self.slot(inst.src)}, %r10\n")
+            asm.append(f"\tmovq\t24(%r10), %rax\n")
+            asm.append(f"\tmovq\t%rax, {self.slot(inst.dest)}\n")
+        elif isinstance(inst, TacStorePrim):
+            asm.append(f"\tmovq\t{self.slot(inst.src)}, %rax\n")
+            asm.append(f"\tmovq\t{self.slot(inst.dest)}, %r10\n")
+            asm.append(f"\tmovq\t%rax, 24(%r10)\n")
+        elif isinstance(inst, TacLoadImm):
+            dest = self.slot(inst.dest)
+            if isinstance(inst.imm, TacImmLabel):
+                asm.append(f"\tleaq\t{inst.imm.val}(%rip), %rax\n")
+                asm.append(f"\tmovq\t%rax, {dest}\n")
+            elif isinstance(inst.imm, TacConstObj):
+                obj_label = self.string_allocator.add_object(inst.imm.obj_type, inst.imm.val)
+                asm.append(f"\tleaq\t{obj_label}(%rip), %rax\n")
+                asm.append(f"\tmovq\t%rax, {dest}\n")
+            elif isinstance(inst.imm, TacStr):
+                str_label = self.string_allocator.add_string(inst.imm.val)
+                asm.append(f"\tleaq\t{str_label}(%rip), %rax\n")
+                asm.append(f"\tmovq\t%rax, {dest}\n")
+            elif isinstance(inst.imm, TacImm):
+                asm.append(f"\tmovq\t${inst.imm.val}, {dest}\n")
+        elif isinstance(inst, (TacCall, TacSyscall, TacCreate)):
+            self.gen_x86_call(asm, inst)
+        elif isinstance(inst, TacRet):
+            asm.append(f"\tmovq\t{self.slot(inst.src)}, %rax\n")
+        elif isinstance(inst, TacCmp):
+            asm.append(f"\tmovq\t{self.slot(inst.src2)}, %rax\n")
+            if inst.width == 32:
+                asm.append(f"\tcmpl\t{self.slot(inst.src1)}, %eax\n")
+            else:
+                asm.append(f"\tcmpq\t{self.slot(inst.src1)}, %rax\n")
+        elif isinstance(inst, TacIcmp):
+            asm.append(f"\tmovq\t{self.slot(inst.src1)}, %rax\n")
+            asm.append(f"\tmovq\t{self.slot(inst.src2)}, %r11\n")
+            self.gen_x86_setcc(asm, inst)
+            asm.append(f"\tmovq\t%rax, {self.slot(inst.dest)}\n")
+        elif isinstance(inst, TacSwitch):
+            table_label = self.label_allocator.emit_label(inst.table_label)
+            asm.append(f"\tmovq\t{self.slot(inst.src)}, %rax\n")
+            asm.append(f"\tleaq\t{table_label}(%rip), %r10\n")
+            asm.append("\tmovslq\t(%r10,%rax,4), %rax\n")
+            asm.append("\taddq\t%r10, %rax\n")
+            asm.append("\tjmp\t*%rax\n")
+            self.gen_x86_jump_table(asm, table_label, inst.targets)
+        elif isinstance(inst, TacBr):
+            self.gen_x86_branch(asm, inst)
+        elif isinstance(inst, TacStoreSelf):
+            asm.append(f"\tmovq\t{self.slot(inst.self_obj)}, %rax\n")
+            asm.append(f"\tmovq\t%rax, {self.slot(inst.dest)}\n")
+        elif isinstance(inst, TacNot):
+            asm.append(f"\tmovq\t{self.slot(inst.src)}, %rax\n")
+            asm.append(f"\txor\t$1, %rax\n")
+            asm.append(f"\tmovq\t%rax, {self.slot(inst.dest)}\n")
+        elif isinstance(inst, TacNegate):
+            asm.append(f"\tmovq\t{self.slot(inst.src)}, %rax\n")
+            asm.append(f"\tneg\t%rax\n")
+            asm.append(f"\tmovq\t%rax, {self.slot(inst.dest)}\n")
+        elif isinstance(inst, TacUnreachable):
+            asm.append(f"\tnop\n")
+
+    def gen_x86_call(self, asm:List[str], inst:Union[TacCall, TacSyscall, TacCreate]) -> None:
+        # rsp is 16 byte aligned between instructions, pad first so it still is once the stack arguments are pushed
+        stack_args = inst.args[len(self.PARAM_REGS):]
+        padding = 8 if len(stack_args) & 1 else 0
+        if padding:
+            asm.append("\tsubq\t$8, %rsp\n")
+        for arg in reversed(stack_args):
+            asm.append(f"\tpushq\t{self.slot(arg)}\n")
+        for i, arg in enumerate(inst.args[:len(self.PARAM_REGS)]):
+            asm.append(f"\tmovq\t{self.slot(arg)}, {self.PARAM_REGS[i]}\n")
+
+        if isinstance(inst, TacSyscall):
+            if "printf" in inst.func:
+                asm.append("\txor\t%eax, %eax\n")
+            asm.append(f"\tcall\t{inst.func}\n")
+        elif isinstance(inst, TacCreate):
+            if inst.object != "SELF_TYPE":
+                asm.append(f"\tcall\t{inst.object}..new\n")
+            else:
+                asm.append(f"\tmovq\t{self.slot(inst.self_reg)}, %rax\n")
+                asm.append("\tmovq\t16(%rax), %rax\n")
+                asm.append("\tmovq\t8(%rax), %rax\n")
+                asm.append("\tcall\t*%rax\n")
+        elif "." in inst.func:
+            asm.append(f"\tleaq\t{inst.func.split('.')[0]}..vtable(%rip), %rax\n")
+            asm.append(f"\tmovq\t{inst.offset}(%rax), %rax\n")
+            asm.append(f"\tcall\t*%rax\n")
+        else:
+            asm.append(f"\tmovq\t16(%rdi), %rax\n")
+            asm.append(f"\tmovq\t{inst.offset}(%rax), %rax\n")
+            asm.append(f"\tcall\t*%rax\n")
+
+        if stack_args or padding:
+            asm.append(f"\taddq\t${8 * len(stack_args) + padding}, %rsp\n")
+        asm.append(f"\tmovq\t%rax, {self.slot(inst.dest)}\n")
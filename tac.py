@@ -1,24 +1,72 @@
 from __future__ import annotations
-from typing import List, Tuple
+from typing import List, Tuple, Any, Union, Generator, FrozenSet, Optional
 from collections import defaultdict
 from tacnodes import *
 
+# new of a class with more attributes than this keeps calling its constructor instead of being expanded in place
+INLINE_NEW_MAX_ATTRS = 8
+
 class DeclarationList(object):
     def __init__(self):
-        self.obj_list:List[Tuple[Any, TacReg]] = []
+        # keyed by id() since ast nodes are matched by identity, the node is kept alongside so its id cannot be reused
+        self.obj_map:Dict[int, Tuple[Any, TacReg]] = {}
     
     def add_node(self, ast_node:Any, tacreg:TacReg) -> None:
-        self.obj_list.append((ast_node, tacreg))
+        self.obj_map[id(ast_node)] = (ast_node, tacreg)
 
     def get_tacreg(self, ast_node:Any) -> TacReg:
-        for item, tacreg in self.obj_list:
-            if ast_node is item:
-                return tacreg
+        entry = self.obj_map.get(id(ast_node))
+        if entry is not None:
+            return entry[1]
 
         raise TypeError("You looked for something nonexistent in the declaration list")
 
     def clear(self) -> None:
-        self.obj_list.clear()
+        self.obj_map.clear()
+
+class SymbolTable(object):
+    """
+    Names visible while generating one class: its attributes form the outermost scope, and self, formals,
+    and let and case bindings are bound on top of them as they come into scope
+    Every name keeps its own stack of shadowing bindings, so binding, unbinding, and lookup are constant time
+    """
+    def __init__(self):
+        self.locals:Dict[str, List[TacReg]] = {}
+        self.attrs:Dict[str, int] = {}
+
+    def bind(self, name:str, reg:TacReg) -> None:
+        self.locals.setdefault(name, []).append(reg)
+
+    def unbind(self, name:str) -> None:
+        bindings = self.locals[name]
+        bindings.pop()
+        if not bindings:
+            del self.locals[name]
+
+    def lookup(self, name:str) -> Optional[TacReg]:
+        # the innermost local binding, None means name is an attribute
+        bindings = self.locals.get(name)
+        return bindings[-1] if bindings else None
+
+    def add_attr(self, name:str, offset:int) -> None:
+        self.attrs[name] = offset
+
+    def attr_offset(self, name:str) -> int:
+        return self.attrs[name]
+
+    def clear_attrs(self) -> None:
+        self.attrs.clear()
+
+class Prim(object):
+    # yielded by tacgen_exp_steps instead of a bare sub-expression when the consumer only needs its
+    # Int/Bool value (or discards it), so an unboxed result is sent back without allocating an object
+    def __init__(self, exp:Expression):
+        self.exp = exp
+
+class Unused(Prim):
+    # yielded for sub-expressions in statement position, nothing reads their value so they skip
+    # result slots, reloads, and boxing, and the register sent back is None
+    pass
 
 class MethodOffsetMap(object):
         def __init__(self):
@@ -32,17 +80,25 @@ class MethodOffsetMap(object):
         
 
 class Tac(object):
-    class_map:Dict[str, List[ClassAttribute]] = defaultdict(list)
-    impl_map:Dict[str, List[ImplMethod]] = defaultdict(list)
-    parent_map:Dict[str, str] = defaultdict(str)
-    symbol_table:Dict[str, List[TacReg]] = defaultdict(list)
-    class_tags:Dict[str, int] = defaultdict(int, {"Bool":0, "Int":1, "String":2, "Object":3, "IO":4})
-    attr_table:Dict[str, int] = defaultdict(int)
-    method_offsets:MethodOffsetMap = MethodOffsetMap()
-    cur_class = ""
-
     def __init__(self, class_map:List[ClassMapEntry], impl_map:List[ImplMapEntry],
             parent_map:List[ParentMapEntry]):
+        # all state is per instance so one interpreter can compile any number of programs
+        self.class_map:Dict[str, List[ClassAttribute]] = defaultdict(list)
+        self.impl_map:Dict[str, List[ImplMethod]] = defaultdict(list)
+        self.parent_map:Dict[str, str] = {}
+        self.symbol_table = SymbolTable()
+        # plain dicts, a lookup of a name that is not a class must not add it (with Bool's tag 0) to the case tables
+        self.class_tags:Dict[str, int] = {"Bool":0, "Int":1, "String":2, "Object":3, "IO":4}
+        # registers holding a raw Int/Bool value rather than a pointer to its box, mapped to the box type
+        self.prim_types:Dict[TacReg, str] = {}
+        # the subset of those holding a literal, these box to a constant object instead of a fresh allocation
+        self.prim_literals:Dict[TacReg, int] = {}
+        self.method_offsets:MethodOffsetMap = MethodOffsetMap()
+        # filled in on the first case, see case_branches
+        self.class_ancestors:Dict[str, List[str]] = {}
+        self.case_tables:Dict[FrozenSet[str], List[Optional[str]]] = {}
+        self.cur_class = ""
+
         count = 5
         for entry in class_map:
             self.class_map[entry.class_name] = entry.attr_list
@@ -64,27 +120,112 @@ class Tac(object):
         self.num = 0
 
     def self_reg(self) -> TacReg:
-        return self.symbol_table["self"][-1]
+        return self.symbol_table.lookup("self")
+
+    def get_classes(self) -> List[str]:
+        # classes that need code generated, in output order
+        return [c for c in self.impl_map if c not in {"Object", "Bool", "String", "Int", "IO"}]
 
     def tacgen(self) -> None:
-        for c in self.impl_map:
-            if c in {"Object", "Bool", "String", "Int", "IO"}:
+        for c in self.get_classes():
+            self.tacgen_class(c)
+
+    def tacgen_class(self, c:str) -> None:
+        # each class only reads the shared tables built in __init__, so classes can be generated independently
+        self.begin_class(c)
+        self.tacgen_constructor(c)
+        for method in self.get_class_methods(c):
+            self.tacgen_func(method)
+        self.end_class()
+
+    def tacgen_stream(self) -> Generator[TacFunc, None, None]:
+        # same functions in the same order as tacgen, handed out one at a time instead of kept in processed_funcs
+        for c in self.get_classes():
+            self.begin_class(c)
+            for method in [None] + self.get_class_methods(c):
+                if method is None:
+                    self.tacgen_constructor(c)
+                else:
+                    self.tacgen_func(method)
+                yield self.processed_funcs.pop()
+            self.end_class()
+
+    def begin_class(self, c:str) -> None:
+        self.cur_class = c
+        offset = 3
+        for attr in self.class_map[c]:
+            self.symbol_table.add_attr(attr.get_name(), offset)
+            offset += 1
+
+        self.declaration_list.clear()
+
+    def end_class(self) -> None:
+        self.symbol_table.clear_attrs()
+
+    def get_class_methods(self, c:str) -> List[ImplMethod]:
+        # inherited methods are generated with the class that defines them
+        return [method for method in self.impl_map[c] if method.parent == c]
+
+    def dispatch_class(self, exp:Dispatch) -> str:
+        # the class whose vtable layout a dispatch goes through
+        if isinstance(exp, StaticDispatch):
+            return exp.class_type.name
+        elif isinstance(exp, SelfDispatch) or exp.obj.exp_type == "SELF_TYPE":
+            return self.cur_class
+        return exp.obj.exp_type
+
+    def compare_kind(self, exp:Binop) -> str:
+        """
+        Picks how a <, <=, or = is lowered from the static operand types:
+        "prim" compares Int/Bool values, "string" calls strcmp on the payloads, "pointer" compares addresses,
+        and "helper" leaves it to the runtime helpers when an operand could be a basic object typed as Object
+        """
+        lhs_type, rhs_type = exp.lhs.exp_type, exp.rhs.exp_type
+        if lhs_type == rhs_type and lhs_type in {"Int", "Bool"}:
+            return "prim"
+        elif lhs_type == rhs_type == "String":
+            return "string"
+        elif isinstance(exp, Eq) and lhs_type is not None and rhs_type is not None \
+                and not {lhs_type, rhs_type} & {"Object", "Int", "Bool", "String"}:
+            return "pointer"
+        return "helper"
+
+    def function_interface(self, c:str, method:ImplMethod=None) -> str:
+        """
+        Describes every entry of the shared tables that generating one function reads
+        (the class layout, dispatch offsets, and for case the whole class hierarchy),
+        the constructor of c is described when method is None
+        """
+        lines = [f"class {c} {self.class_tags[c]}"]
+        lines.extend(f"attr {attr.get_name()} {attr.get_type()}" for attr in self.class_map[c])
+
+        work_list:List[Any] = [method.expr] if method is not None else [attr.attr_expr for attr in self.class_map[c]]
+        has_case = False
+        while work_list:
+            node = work_list.pop()
+            if isinstance(node, list):
+                work_list.extend(node)
+                continue
+            if not isinstance(node, (Expression, LetBinding, CaseElement)):
                 continue
 
-            self.cur_class = c
-            offset = 3
-            for attr in self.class_map[c]:
-                self.attr_table[attr.get_name()] = offset
-                offset += 1
+            if isinstance(node, Dispatch):
+                class_name = self.dispatch_class(node)
+                method_name = node.get_func_name()
+                lines.append(f"dispatch {class_name}.{method_name} {self.method_offsets.get_method_offset(class_name, method_name)}")
+            elif isinstance(node, Case):
+                has_case = True
+            elif isinstance(node, New) and self.inline_constructor(node.class_name.get_name()):
+                class_name = node.class_name.get_name()
+                lines.append(f"new {class_name} {self.class_tags[class_name]} " + " ".join(repr(attr) for attr in self.class_map[class_name]))
 
-            self.declaration_list.clear()
-            self.tacgen_constructor(c)
-            for method in self.impl_map[c]:
-                if method.parent != c:
-                    continue
-                self.tacgen_func(method)
-            
-            self.attr_table.clear()
+            for cls in type(node).__mro__:
+                work_list.extend(getattr(node, slot) for slot in getattr(cls, "__slots__", ()))
+
+        if has_case:
+            # case dispatch tables are built from every class tag and the parent chain above it
+            lines.extend(f"tag {class_name} {class_tag} {self.parent_map.get(class_name, '')}" for class_name, class_tag in self.class_tags.items())
+        return "\n".join(lines)
 
     def tacgen_constructor(self, c:str):
         self.cur_tacfunc = TacFunc(f"{c}..new")
@@ -102,7 +243,7 @@ class Tac(object):
         self.cur_tacfunc.append(TacSyscall("calloc@PLT", [calloc_elems_reg, calloc_size_reg], temp_reg))
         self.cur_tacfunc.append(TacStoreSelf(temp_reg, self_reg))
         self.cur_tacfunc.set_self_reg(self_reg)
-        self.symbol_table["self"].append(self_reg)
+        self.symbol_table.bind("self", self_reg)
 
         # store class_tag, obj_size, and vtable
         class_tag_reg = self.cur_tacfunc.create_reg()
@@ -115,19 +256,29 @@ class Tac(object):
         self.cur_tacfunc.append(TacLoadImm(TacImmLabel(f"{c}..vtable"), vtable_reg))
         self.cur_tacfunc.append(TacStore(vtable_reg, self_reg, 2))
 
+        # an attribute only needs its default object if something can read it before its initializer overwrites it:
+        # an initializer up to and including its own that names it, or one that dispatches, since any method may read it
+        read_early:Set[str] = set()
+        dispatched = False
         for attr in self.class_map[c]:
-            if attr.attr_type in {"Bool", "Int", "String"}:
-                temp_reg = self.cur_tacfunc.create_reg()
-                self.cur_tacfunc.append(TacCreate(attr.attr_type, temp_reg))
-                self.cur_tacfunc.append(TacStore(temp_reg, self_reg, self.attr_table[attr.get_name()]))
+            if attr.attr_kind == "initializer" and not dispatched:
+                reads = self.initializer_reads(attr.attr_expr)
+                if reads is None:
+                    dispatched = True
+                else:
+                    read_early |= reads
+            overwritten = attr.attr_kind == "initializer" and not dispatched and attr.get_name() not in read_early
+            if attr.attr_type in {"Bool", "Int", "String"} and not overwritten:
+                temp_reg = self.default_object(attr.attr_type)
+                self.cur_tacfunc.append(TacStore(temp_reg, self_reg, self.symbol_table.attr_offset(attr.get_name())))
                 
         for attr in self.class_map[c]:
             if attr.attr_kind == "initializer":
                 attr_ret = self.tacgen_exp(attr.attr_expr)
-                self.cur_tacfunc.append(TacStore(attr_ret, self_reg, self.attr_table[attr.get_name()]))
+                self.cur_tacfunc.append(TacStore(attr_ret, self_reg, self.symbol_table.attr_offset(attr.get_name())))
         
         self.cur_tacfunc.append(TacRet(self_reg))
-        self.symbol_table["self"].pop()
+        self.symbol_table.unbind("self")
         self.processed_funcs.append(self.cur_tacfunc)
         self.declaration_list.clear()
 
@@ -148,12 +299,12 @@ class Tac(object):
         for i, param in enumerate(params):
             name = param_names[i]
             self.cur_tacfunc.append(TacAlloc(name, local_regs[i]))
-            self.symbol_table[name].append(local_regs[i])
+            self.symbol_table.bind(name, local_regs[i])
 
         self_obj = self.cur_tacfunc.create_reg()
         self.cur_tacfunc.append(TacStoreSelf(self_param, self_obj))
         self.cur_tacfunc.set_self_reg(self_obj)
-        self.symbol_table["self"].append(self_obj)
+        self.symbol_table.bind("self", self_obj)
 
         for i, param in enumerate(params):
             self.cur_tacfunc.append(TacStore(param, local_regs[i]))
@@ -163,46 +314,45 @@ class Tac(object):
         self.processed_funcs.append(self.cur_tacfunc)
 
         for param_name in param_names:
-            self.symbol_table[param_name].pop()
-        self.symbol_table["self"].pop()
+            self.symbol_table.unbind(param_name)
+        self.symbol_table.unbind("self")
 
         self.declaration_list.clear()
 
-    def create_let_stack_vars(self, binding:LetBinding):
-        self.declaration_list.add_node(binding, self.cur_tacfunc.create_reg(True))
-        self.cur_tacfunc.append(TacAlloc(binding.var_type.name, self.declaration_list.get_tacreg(binding)))
-        self.create_stack_vars(binding.val)
-
-    def create_case_stack_vars(self, case_elem:CaseElement):
-        self.declaration_list.add_node(case_elem, self.cur_tacfunc.create_reg(True))
-        self.cur_tacfunc.append(TacAlloc(case_elem.get_type(), self.declaration_list.get_tacreg(case_elem)))
-        self.create_stack_vars(case_elem.expr)
-
-    def gen_case_labels(self, case_list:List[CaseElement], error_label:TacReg) -> List[TacLabel]:
-        def visit(self:Tac, class_name:str, case_labels:List[TacLabel]) -> TacLabel:
-            index = self.class_tags[class_name]
-            if case_labels[index] is not None:
-                return case_labels[index]
-
-            parent_class = self.parent_map[class_name]
-            case_labels[index] = visit(self, parent_class, case_labels)
-            return case_labels[index]
-
-        # generate assume every label jumps to the error condition
-        case_labels = [None for _ in self.class_tags]
-
-        for case_elem in case_list:
-            case_labels[self.class_tags[case_elem.get_type()]] = self.cur_tacfunc.create_label()
-
-        # make our base case condition: if Object has not been assigned a label it has to fall through
-        if case_labels[self.class_tags["Object"]] is None:
-            case_labels[self.class_tags["Object"]] = error_label
-
+    def add_stack_var(self, ast_node:Any, obj_type:str) -> None:
+        self.declaration_list.add_node(ast_node, self.cur_tacfunc.create_reg(True))
+        self.cur_tacfunc.append(TacAlloc(obj_type, self.declaration_list.get_tacreg(ast_node)))
+
+    def case_branches(self, branch_types:FrozenSet[str]) -> List[Optional[str]]:
+        """
+        Maps every class tag to the case branch that handles it, the closest ancestor (or the class itself)
+        with a branch, or None when no branch matches
+        The table only depends on which types have branches, so it is built once per distinct set per program
+        """
+        table = self.case_tables.get(branch_types)
+        if table is not None:
+            return table
+
+        if not self.class_ancestors:
+            for class_name in self.class_tags:
+                ancestors:List[str] = []
+                while class_name:
+                    ancestors.append(class_name)
+                    class_name = self.parent_map[class_name] if class_name != "Object" else ""
+                self.class_ancestors[ancestors[0]] = ancestors
+
+        table = [None] * len(self.class_tags)
         for class_name, class_tag in self.class_tags.items():
-            # walk through the parent map, when we find the first non-error label we are good
-            case_labels[class_tag] = visit(self, class_name, case_labels)
-        
-        return case_labels
+            table[class_tag] = next((ancestor for ancestor in self.class_ancestors[class_name] if ancestor in branch_types), None)
+        self.case_tables[branch_types] = table
+        return table
+
+    def inline_constructor(self, c:str) -> bool:
+        # the constructor of c only allocates, fills in the header, and stores defaults and literals, so new c can
+        # do the same in place, initializers that run code and the runtime's own classes keep the call
+        if c in {"SELF_TYPE", "Object", "IO", "Int", "String", "Bool"} or len(self.class_map[c]) > INLINE_NEW_MAX_ATTRS:
+            return False
+        return all(attr.attr_expr is None or isinstance(attr.attr_expr, (Integer, StringExp, Bool)) for attr in self.class_map[c])
 
     def add_tac_create(self, obj_type:str) -> TacReg:
         create_reg = self.cur_tacfunc.create_reg()
@@ -212,57 +362,173 @@ class Tac(object):
         self.cur_tacfunc.append(create_inst)
         return create_reg
 
+    def default_object(self, obj_type:str) -> TacReg:
+        # the defaults are never written to, so they are the same shared objects the literals 0, false, and "" box to
+        default_reg = self.cur_tacfunc.create_reg()
+        if obj_type == "Bool":
+            self.cur_tacfunc.append(TacLoadImm(TacImmLabel("Bool..false"), default_reg))
+        else:
+            self.cur_tacfunc.append(TacLoadImm(TacConstObj(obj_type, 0 if obj_type == "Int" else ""), default_reg))
+        return default_reg
+
+    def initializer_reads(self, exp:Expression) -> Optional[Set[str]]:
+        # names of the variables exp reads, or None if it dispatches and so might read any attribute
+        reads:Set[str] = set()
+        work_list:List[Expression] = [exp]
+        while work_list:
+            exp = work_list.pop()
+            if exp is None:
+                continue
+            if isinstance(exp, Dispatch):
+                return None
+            if isinstance(exp, Variable):
+                reads.add(exp.var.name)
+            elif isinstance(exp, Binop):
+                work_list.extend([exp.lhs, exp.rhs])
+            elif isinstance(exp, UnaryOp):
+                work_list.append(exp.rhs)
+            elif isinstance(exp, Block):
+                work_list.extend(exp.body)
+            elif isinstance(exp, If):
+                work_list.extend([exp.condition, exp.then_body, exp.else_body])
+            elif isinstance(exp, While):
+                work_list.extend([exp.condition, exp.while_body])
+            elif isinstance(exp, Let):
+                work_list.extend(binding.val for binding in exp.binding_list)
+                work_list.append(exp.expr)
+            elif isinstance(exp, Case):
+                work_list.append(exp.case_expr)
+                work_list.extend(case_elem.expr for case_elem in exp.case_list)
+            elif isinstance(exp, Assign):
+                work_list.append(exp.rhs)
+        return reads
+
     def create_stack_vars(self, exp:Expression) -> None:
         # search for any variables that we should put on the stack, primarily let variables and case variables
-        if exp is None:
-            return
+        # the walk uses an explicit work list so deeply nested expressions do not exhaust the call stack;
+        # tuples on the work list are stack slots to allocate once everything pushed above them is visited
+        # expressions whose value is discarded come wrapped in Unused, if and case only need a result slot when it is read
+        work_list:List[Union[Expression, Unused, Tuple[Any, str]]] = [exp]
+        while work_list:
+            item = work_list.pop()
+            if item is None:
+                continue
+            if isinstance(item, tuple):
+                self.add_stack_var(*item)
+                continue
 
-        if isinstance(exp, Binop):
-            self.create_stack_vars(exp.lhs)
-            self.create_stack_vars(exp.rhs)
-        elif isinstance(exp, UnaryOp):
-            self.create_stack_vars(exp.rhs)
-        elif isinstance(exp, Block):
-            for expr in exp.body:
-                self.create_stack_vars(expr)
-        elif isinstance(exp, If):
-            self.create_stack_vars(exp.condition)
-            self.create_stack_vars(exp.then_body)
-            self.create_stack_vars(exp.else_body)
-        elif isinstance(exp, While):
-            self.create_stack_vars(exp.condition)
-            self.create_stack_vars(exp.while_body)
-        elif isinstance(exp, Let):
-            for binding in exp.binding_list:
-                self.create_let_stack_vars(binding)
-            self.create_stack_vars(exp.expr)
-        elif isinstance(exp, Case):
-            self.create_stack_vars(exp.case_expr)
-            for case_elem in exp.case_list:
-                self.create_case_stack_vars(case_elem)
-        elif isinstance(exp, Dispatch):
-            self.create_stack_vars(exp.obj)
-            for arg in exp.args:
-                self.create_stack_vars(arg)
-        elif isinstance(exp, Assign):
-            self.create_stack_vars(exp.rhs)
-        
-        if isinstance(exp, (Case, If)):
-            self.declaration_list.add_node(exp, self.cur_tacfunc.create_reg(True))
-            self.cur_tacfunc.append(TacAlloc(exp.exp_type, self.declaration_list.get_tacreg(exp)))
+            used = not isinstance(item, Unused)
+            exp = item if used else item.exp
+            if exp is None:
+                continue
+            if isinstance(exp, (Case, If)) and used:
+                work_list.append((exp, exp.exp_type))
+            elif isinstance(exp, IsVoid):
+                work_list.append((exp, "Bool"))
+
+            # children are pushed in reverse so they are visited in source order
+            children:List[Union[Expression, Unused, Tuple[Any, str]]] = []
+            if isinstance(exp, Binop):
+                children = [exp.lhs, exp.rhs]
+            elif isinstance(exp, UnaryOp):
+                children = [exp.rhs]
+            elif isinstance(exp, Block):
+                children = [Unused(expr) for expr in exp.body[:-1]]
+                children.append(exp.body[-1] if used else Unused(exp.body[-1]))
+            elif isinstance(exp, If):
+                children = [exp.condition] + [body if used else Unused(body) for body in (exp.then_body, exp.else_body)]
+            elif isinstance(exp, While):
+                children = [exp.condition, Unused(exp.while_body)]
+            elif isinstance(exp, Let):
+                for binding in exp.binding_list:
+                    children.extend([(binding, binding.var_type.name), binding.val])
+                children.append(exp.expr if used else Unused(exp.expr))
+            elif isinstance(exp, Case):
+                children = [exp.case_expr]
+                for case_elem in exp.case_list:
+                    children.extend([(case_elem, case_elem.get_type()), case_elem.expr if used else Unused(case_elem.expr)])
+            elif isinstance(exp, Dispatch):
+                children = [exp.obj] + exp.args
+            elif isinstance(exp, Assign):
+                children = [exp.rhs]
+
+            work_list.extend(reversed(children))
+
+    def box(self, reg:TacReg) -> TacReg:
+        if reg not in self.prim_types:
+            return reg
+        box_reg = self.cur_tacfunc.create_reg()
+        if self.prim_types[reg] == "Bool":
+            # the runtime owns the only two Bool objects, every true and false in the program is one of them
+            if reg in self.prim_literals:
+                self.cur_tacfunc.append(TacLoadImm(TacImmLabel("Bool..true" if self.prim_literals[reg] else "Bool..false"), box_reg))
+                return box_reg
+            # Bool..true is laid out right after Bool..false, so the value picks the singleton without a branch
+            false_reg = self.cur_tacfunc.create_reg()
+            size_reg = self.cur_tacfunc.create_reg()
+            offset_reg = self.cur_tacfunc.create_reg()
+            self.cur_tacfunc.append(TacLoadImm(TacImmLabel("Bool..false"), false_reg))
+            self.cur_tacfunc.append(TacLoadImm(TacImm(32), size_reg))
+            self.cur_tacfunc.append(TacMul(reg, size_reg, offset_reg))
+            self.cur_tacfunc.append(TacAdd(false_reg, offset_reg, box_reg))
+            return box_reg
+        if reg in self.prim_literals:
+            self.cur_tacfunc.append(TacLoadImm(TacConstObj(self.prim_types[reg], self.prim_literals[reg]), box_reg))
+            return box_reg
+        self.cur_tacfunc.append(TacCreate(self.prim_types[reg], box_reg))
+        self.cur_tacfunc.append(TacStorePrim(reg, box_reg))
+        return box_reg
+
+    def unbox(self, reg:TacReg) -> TacReg:
+        if reg in self.prim_types:
+            return reg
+        prim_reg = self.cur_tacfunc.create_reg()
+        self.cur_tacfunc.append(TacLoadPrim(reg, prim_reg))
+        return prim_reg
+
+    def prim_result(self, reg:TacReg, obj_type:str) -> TacReg:
+        self.prim_types[reg] = obj_type
+        return reg
 
     def tacgen_exp(self, exp:Expression) -> TacReg:
+        # tacgen_exp_steps yields every sub-expression it needs instead of recursing, and we send
+        # back the register holding its result; the stack of suspended generators replaces the call stack
+        # Int/Bool results stay unboxed until they reach a consumer that did not ask for a Prim,
+        # so only values that escape (stored, passed, returned, compared) get a box
+        self.prim_types.clear()
+        self.prim_literals.clear()
+        stack:List[Generator[Union[Expression, Prim], TacReg, TacReg]] = [self.tacgen_exp_steps(exp)]
+        needs_box:List[bool] = [True]
+        result = None
+        while stack:
+            try:
+                sub_exp = stack[-1].send(result)
+            except StopIteration as done:
+                stack.pop()
+                result = done.value
+                if needs_box.pop():
+                    result = self.box(result)
+                continue
+
+            if isinstance(sub_exp, Unused):
+                stack.append(self.tacgen_exp_steps(sub_exp.exp, False))
+                needs_box.append(False)
+            elif isinstance(sub_exp, Prim):
+                stack.append(self.tacgen_exp_steps(sub_exp.exp))
+                needs_box.append(False)
+            else:
+                stack.append(self.tacgen_exp_steps(sub_exp))
+                needs_box.append(True)
+            result = None
+
+        return result
+
+    def tacgen_exp_steps(self, exp:Expression, used:bool=True) -> Generator[Union[Expression, Prim], TacReg, TacReg]:
+        # used is False when exp was yielded as Unused, control flow then only runs its sub-expressions for their effects
         if isinstance(exp, Binop):
-            lhs_reg = self.tacgen_exp(exp.lhs)
-            rhs_reg = self.tacgen_exp(exp.rhs)
-            #rhs_reg = self.tacgen_exp(exp.rhs)
-            create_reg = self.cur_tacfunc.create_reg()
             if isinstance(exp, (Plus, Minus, Times, Divide)):
-                self.cur_tacfunc.append(TacCreate("Int", create_reg))
-                lhs_prim = self.cur_tacfunc.create_reg()
-                self.cur_tacfunc.append(TacLoadPrim(lhs_reg, lhs_prim))
-                rhs_prim = self.cur_tacfunc.create_reg()
-                self.cur_tacfunc.append(TacLoadPrim(rhs_reg, rhs_prim))
+                lhs_prim = self.unbox((yield Prim(exp.lhs)))
+                rhs_prim = self.unbox((yield Prim(exp.rhs)))
                 res_reg = self.cur_tacfunc.create_reg()
                 if isinstance(exp, Plus):
                     self.cur_tacfunc.append(TacAdd(lhs_prim, rhs_prim, res_reg))
@@ -278,18 +544,40 @@ class Tac(object):
                     false_label = self.cur_tacfunc.create_label()
                     self.cur_tacfunc.append(TacBr(TacCmpOp.EQ, true_label, false_label))
                     self.cur_tacfunc.append(true_label)
-                    error_str = self.cur_tacfunc.create_reg()
-                    self.cur_tacfunc.append(TacLoadImm(TacStr(f"ERROR: {exp.lineno}: Exception: division by zero\\n"), error_str))
-                    self.cur_tacfunc.append(TacSyscall("cooloutstr", [error_str], self.cur_tacfunc.create_reg()))
-                    one_reg = self.cur_tacfunc.create_reg()
-                    self.cur_tacfunc.append(TacLoadImm(TacImm(0), one_reg))
-                    self.cur_tacfunc.append(TacSyscall("exit@PLT", [one_reg], self.cur_tacfunc.create_reg()))
-                    self.cur_tacfunc.append(TacUnreachable())
+                    self.cur_tacfunc.append(TacTrap("div_zero_error", exp.lineno))
                     self.cur_tacfunc.append(false_label)
                     self.cur_tacfunc.append(TacDiv(lhs_prim, rhs_prim, res_reg))
-                self.cur_tacfunc.append(TacStorePrim(res_reg, create_reg))
-                return create_reg
+                return self.prim_result(res_reg, "Int")
+            kind = self.compare_kind(exp)
+            cmp_op = TacCmpOp.LT if isinstance(exp, Lt) else TacCmpOp.LE if isinstance(exp, Le) else TacCmpOp.EQ
+            if kind == "prim":
+                lhs_prim = self.unbox((yield Prim(exp.lhs)))
+                rhs_prim = self.unbox((yield Prim(exp.rhs)))
+                res_reg = self.cur_tacfunc.create_reg()
+                self.cur_tacfunc.append(TacIcmp(cmp_op, lhs_prim, rhs_prim, res_reg, 32))
+                return self.prim_result(res_reg, "Bool")
+            elif kind == "string":
+                lhs_reg = (yield exp.lhs)
+                rhs_reg = (yield exp.rhs)
+                lhs_str = self.unbox(lhs_reg)
+                rhs_str = self.unbox(rhs_reg)
+                strcmp_reg = self.cur_tacfunc.create_reg()
+                self.cur_tacfunc.append(TacSyscall("strcmp", [lhs_str, rhs_str], strcmp_reg))
+                zero_reg = self.cur_tacfunc.create_reg()
+                self.cur_tacfunc.append(TacLoadImm(TacImm(0), zero_reg))
+                res_reg = self.cur_tacfunc.create_reg()
+                # strcmp returns an int, only the low half of the register is defined
+                self.cur_tacfunc.append(TacIcmp(cmp_op, strcmp_reg, zero_reg, res_reg, 32))
+                return self.prim_result(res_reg, "Bool")
+            elif kind == "pointer":
+                lhs_reg = (yield exp.lhs)
+                rhs_reg = (yield exp.rhs)
+                res_reg = self.cur_tacfunc.create_reg()
+                self.cur_tacfunc.append(TacIcmp(cmp_op, lhs_reg, rhs_reg, res_reg))
+                return self.prim_result(res_reg, "Bool")
             else:
+                lhs_reg = (yield exp.lhs)
+                rhs_reg = (yield exp.rhs)
                 res_reg = self.cur_tacfunc.create_reg()
                 if isinstance(exp, Lt):
                     self.cur_tacfunc.append(TacSyscall("lt_helper", [lhs_reg, rhs_reg], res_reg))
@@ -300,31 +588,22 @@ class Tac(object):
                 return res_reg
 
         elif isinstance(exp, Integer):
-            int_reg = self.cur_tacfunc.create_reg()
             prim_int_val = self.cur_tacfunc.create_reg()
-            self.cur_tacfunc.append(TacCreate("Int", int_reg))
             self.cur_tacfunc.append(TacLoadImm(TacImm(int(exp.val)), prim_int_val))
-            self.cur_tacfunc.append(TacStorePrim(prim_int_val, int_reg))
-            #self.cur_tacfunc.append(TacStore(prim_int_val, int_reg, 3))
-            return int_reg
+            self.prim_literals[prim_int_val] = int(exp.val)
+            return self.prim_result(prim_int_val, "Int")
         elif isinstance(exp, StringExp):
+            # strings are immutable, every evaluation can share one object in the data section
             str_reg = self.cur_tacfunc.create_reg()
-            prim_str_val = self.cur_tacfunc.create_reg()
-            self.cur_tacfunc.append(TacCreate("String", str_reg))
-            self.cur_tacfunc.append(TacLoadImm(TacStr(exp.val), prim_str_val))
-            self.cur_tacfunc.append(TacStorePrim(prim_str_val, str_reg))
-            #self.cur_tacfunc.append(TacStore(prim_str_val, str_reg, 3))
+            self.cur_tacfunc.append(TacLoadImm(TacConstObj("String", exp.val), str_reg))
             return str_reg
         elif isinstance(exp, Bool):
-            bool_reg = self.cur_tacfunc.create_reg()
             prim_bool_val = self.cur_tacfunc.create_reg()
-            self.cur_tacfunc.append(TacCreate("Bool", bool_reg))
             self.cur_tacfunc.append(TacLoadImm(TacImm(1 if exp.kind == "true" else 0), prim_bool_val))
-            self.cur_tacfunc.append(TacStorePrim(prim_bool_val, bool_reg))
-            #self.cur_tacfunc.append(TacStore(prim_bool_val, bool_reg, 3))
-            return bool_reg
+            self.prim_literals[prim_bool_val] = 1 if exp.kind == "true" else 0
+            return self.prim_result(prim_bool_val, "Bool")
         elif isinstance(exp, Dispatch):
-            obj_reg = self.tacgen_exp(exp.obj) if exp.obj is not None else self.self_reg()
+            obj_reg = (yield exp.obj) if exp.obj is not None else self.self_reg()
             if not isinstance(exp, SelfDispatch):
                 void_branch = self.cur_tacfunc.create_label()
                 nonvoid_branch = self.cur_tacfunc.create_label()
@@ -333,104 +612,105 @@ class Tac(object):
                 self.cur_tacfunc.append(TacCmp(void_reg, obj_reg))
                 self.cur_tacfunc.append(TacBr(TacCmpOp.NE, nonvoid_branch, void_branch))
                 self.cur_tacfunc.append(void_branch)
-                error_str = self.cur_tacfunc.create_reg()
-                self.cur_tacfunc.append(TacLoadImm(TacStr(f"ERROR: {exp.lineno}: Exception: dispatch on void\\n"), error_str))
-                self.cur_tacfunc.append(TacSyscall("cooloutstr", [error_str], self.cur_tacfunc.create_reg()))
-                zero_reg = self.cur_tacfunc.create_reg()
-                self.cur_tacfunc.append(TacLoadImm(TacImm(0), zero_reg))
-                self.cur_tacfunc.append(TacSyscall("exit", [zero_reg], self.cur_tacfunc.create_reg()))
-                self.cur_tacfunc.append(TacUnreachable())
+                self.cur_tacfunc.append(TacTrap("dispatch_void_error", exp.lineno))
                 self.cur_tacfunc.append(nonvoid_branch)
 
             param_regs = [obj_reg]
             for arg in exp.args:
-                param_regs.append(self.tacgen_exp(arg))
+                param_regs.append((yield arg))
             
             ret_reg = self.cur_tacfunc.create_reg()
             func_str = f"{exp.class_type.name}.{exp.get_func_name()}" if isinstance(exp, StaticDispatch) else f"{exp.get_func_name()}"
-            if isinstance(exp, StaticDispatch):
-                class_name = exp.class_type.name
-            elif isinstance(exp, SelfDispatch) or exp.obj.exp_type == "SELF_TYPE":
-                class_name = self.cur_class
-            else:
-                class_name = exp.obj.exp_type
-            
-            offset = self.method_offsets.get_method_offset(class_name, exp.get_func_name())
+            offset = self.method_offsets.get_method_offset(self.dispatch_class(exp), exp.get_func_name())
             self.cur_tacfunc.append(TacCall(func_str, param_regs, ret_reg, offset))
             return ret_reg
         elif isinstance(exp, Variable):
             var_name = exp.var.name
             temp_reg = self.cur_tacfunc.create_reg()
-            if self.symbol_table[var_name]:
-                self.cur_tacfunc.append(TacLoad(self.symbol_table[var_name][-1], temp_reg))
+            local_reg = self.symbol_table.lookup(var_name)
+            if local_reg is not None:
+                self.cur_tacfunc.append(TacLoad(local_reg, temp_reg))
             else:
-                self.cur_tacfunc.append(TacLoad(self.symbol_table["self"][-1], temp_reg, self.attr_table[var_name]))
+                self.cur_tacfunc.append(TacLoad(self.self_reg(), temp_reg, self.symbol_table.attr_offset(var_name)))
             return temp_reg
         elif isinstance(exp, New):
-            dest_reg = self.add_tac_create(exp.class_name.get_name())
-            return dest_reg
-        elif isinstance(exp, UnaryOp):
-            rhs_reg = self.tacgen_exp(exp.rhs)
+            class_name = exp.class_name.get_name()
+            if not self.inline_constructor(class_name):
+                return self.add_tac_create(class_name)
+
+            # same object c..new would build: calloc, the class tag, size, and vtable, then every attribute
+            num_elems = 3 + len(self.class_map[class_name])
+            elems_reg = self.cur_tacfunc.create_reg()
+            size_reg = self.cur_tacfunc.create_reg()
+            obj_reg = self.cur_tacfunc.create_reg()
+            self.cur_tacfunc.append(TacLoadImm(TacImm(num_elems), elems_reg))
+            self.cur_tacfunc.append(TacLoadImm(TacImm(8), size_reg))
+            self.cur_tacfunc.append(TacSyscall("calloc@PLT", [elems_reg, size_reg], obj_reg))
+            header = [TacImm(self.class_tags[class_name]), TacImm(num_elems), TacImmLabel(f"{class_name}..vtable")]
+            for offset, imm in enumerate(header):
+                header_reg = self.cur_tacfunc.create_reg()
+                self.cur_tacfunc.append(TacLoadImm(imm, header_reg))
+                self.cur_tacfunc.append(TacStore(header_reg, obj_reg, offset))
+            for offset, attr in enumerate(self.class_map[class_name], 3):
+                if attr.attr_expr is not None:
+                    attr_reg = (yield attr.attr_expr)
+                elif attr.attr_type in {"Bool", "Int", "String"}:
+                    attr_reg = self.default_object(attr.attr_type)
+                else:
+                    continue
+                self.cur_tacfunc.append(TacStore(attr_reg, obj_reg, offset))
+            return obj_reg
+        elif isinstance(exp, (Negate, Not)):
+            rhs_prim = self.unbox((yield Prim(exp.rhs)))
             dest_reg = self.cur_tacfunc.create_reg()
             if isinstance(exp, Negate):
-                int_prim = self.cur_tacfunc.create_reg()
-                negative_reg = self.cur_tacfunc.create_reg()
-                self.cur_tacfunc.append(TacLoadPrim(rhs_reg, int_prim))
-                self.cur_tacfunc.append(TacNegate(int_prim, negative_reg))
-                self.cur_tacfunc.append(TacCreate("Int", dest_reg))
-                self.cur_tacfunc.append(TacStorePrim(negative_reg, dest_reg))
-            elif isinstance(exp, Not):
-                bool_prim = self.cur_tacfunc.create_reg()
-                logical_negate_reg = self.cur_tacfunc.create_reg()
-                self.cur_tacfunc.append(TacLoadPrim(rhs_reg, bool_prim))
-                self.cur_tacfunc.append(TacNot(bool_prim, logical_negate_reg))
-                self.cur_tacfunc.append(TacCreate("Bool", dest_reg))
-                self.cur_tacfunc.append(TacStorePrim(logical_negate_reg, dest_reg))
+                self.cur_tacfunc.append(TacNegate(rhs_prim, dest_reg))
+                return self.prim_result(dest_reg, "Int")
             else:
-                # isvoid
-                self.cur_tacfunc.append(TacCreate("Bool", dest_reg))
-                zero_reg = self.cur_tacfunc.create_reg()
-                self.cur_tacfunc.append(TacLoadImm(TacImm(0), zero_reg))
-                self.cur_tacfunc.append(TacCmp(rhs_reg, zero_reg))
-                true_label = self.cur_tacfunc.create_label()
-                false_label = self.cur_tacfunc.create_label()
-                end_label = self.cur_tacfunc.create_label()
-                self.cur_tacfunc.append(TacBr(TacCmpOp.EQ, true_label, false_label))
-                self.cur_tacfunc.append(true_label)
-                true_reg = self.cur_tacfunc.create_reg()
-                self.cur_tacfunc.append(TacLoadImm(TacImm(1), true_reg))
-                self.cur_tacfunc.append(TacStorePrim(true_reg, dest_reg))
-                self.cur_tacfunc.append(TacBr(true_label=end_label))
-                self.cur_tacfunc.append(false_label)
-                false_reg = self.cur_tacfunc.create_reg()
-                self.cur_tacfunc.append(TacLoadImm(TacImm(0), false_reg))
-                self.cur_tacfunc.append(TacStorePrim(false_reg, dest_reg))
-                self.cur_tacfunc.append(TacBr(true_label=end_label))
-                self.cur_tacfunc.append(end_label)
-            return dest_reg
-        elif isinstance(exp, If):
+                self.cur_tacfunc.append(TacNot(rhs_prim, dest_reg))
+                return self.prim_result(dest_reg, "Bool")
+        elif isinstance(exp, IsVoid):
+            rhs_reg = (yield exp.rhs)
+            zero_reg = self.cur_tacfunc.create_reg()
+            self.cur_tacfunc.append(TacLoadImm(TacImm(0), zero_reg))
+            self.cur_tacfunc.append(TacCmp(rhs_reg, zero_reg))
             true_label = self.cur_tacfunc.create_label()
             false_label = self.cur_tacfunc.create_label()
             end_label = self.cur_tacfunc.create_label()
-            cond_reg = self.tacgen_exp(exp.condition)
-            boolean_reg = self.cur_tacfunc.create_reg()
-            false_reg = self.cur_tacfunc.create_reg()
-            self.cur_tacfunc.append(TacLoad(cond_reg, boolean_reg, 3))
-            self.cur_tacfunc.append(TacLoadImm(TacImm(0), false_reg))
-            self.cur_tacfunc.append(TacCmp(boolean_reg, false_reg))
-            self.cur_tacfunc.append(TacBr(TacCmpOp.NE, true_label, false_label))
-
+            self.cur_tacfunc.append(TacBr(TacCmpOp.EQ, true_label, false_label))
             self.cur_tacfunc.append(true_label)
-            then_reg = self.tacgen_exp(exp.then_body)
-            self.cur_tacfunc.append(TacStore(then_reg, self.declaration_list.get_tacreg(exp)))
+            true_reg = self.cur_tacfunc.create_reg()
+            self.cur_tacfunc.append(TacLoadImm(TacImm(1), true_reg))
+            self.cur_tacfunc.append(TacStore(true_reg, self.declaration_list.get_tacreg(exp)))
             self.cur_tacfunc.append(TacBr(true_label=end_label))
-
             self.cur_tacfunc.append(false_label)
-            else_reg = self.tacgen_exp(exp.else_body)
-            self.cur_tacfunc.append(TacStore(else_reg, self.declaration_list.get_tacreg(exp)))
+            false_reg = self.cur_tacfunc.create_reg()
+            self.cur_tacfunc.append(TacLoadImm(TacImm(0), false_reg))
+            self.cur_tacfunc.append(TacStore(false_reg, self.declaration_list.get_tacreg(exp)))
             self.cur_tacfunc.append(TacBr(true_label=end_label))
             self.cur_tacfunc.append(end_label)
+            # the slot holds the raw value, box() turns it into a Bool singleton if it escapes
+            dest_reg = self.cur_tacfunc.create_reg()
+            self.cur_tacfunc.append(TacLoad(self.declaration_list.get_tacreg(exp), dest_reg))
+            return self.prim_result(dest_reg, "Bool")
+        elif isinstance(exp, If):
+            true_label = self.cur_tacfunc.create_label()
+            false_label = self.cur_tacfunc.create_label()
+            end_label = self.cur_tacfunc.create_label()
+            yield from self.tacgen_cond_steps(exp.condition, true_label, false_label)
+
+            for label, body in ((true_label, exp.then_body), (false_label, exp.else_body)):
+                self.cur_tacfunc.append(label)
+                if used:
+                    body_reg = (yield body)
+                    self.cur_tacfunc.append(TacStore(body_reg, self.declaration_list.get_tacreg(exp)))
+                else:
+                    (yield Unused(body))
+                self.cur_tacfunc.append(TacBr(true_label=end_label))
+            self.cur_tacfunc.append(end_label)
 
+            if not used:
+                return None
             ret_reg = self.cur_tacfunc.create_reg()
             self.cur_tacfunc.append(TacLoad(self.declaration_list.get_tacreg(exp), ret_reg))
             return ret_reg
@@ -440,65 +720,66 @@ class Tac(object):
             while_end = self.cur_tacfunc.create_label()
             self.cur_tacfunc.append(TacBr(true_label=while_start))
             self.cur_tacfunc.append(while_start)
-            cond_reg = self.tacgen_exp(exp.condition)
-            boolean_reg = self.cur_tacfunc.create_reg()
-            false_reg = self.cur_tacfunc.create_reg()
-            self.cur_tacfunc.append(TacLoadPrim(cond_reg, boolean_reg))
-            self.cur_tacfunc.append(TacLoadImm(TacImm(0), false_reg))
-            self.cur_tacfunc.append(TacCmp(boolean_reg, false_reg))
-            self.cur_tacfunc.append(TacBr(TacCmpOp.NE, while_body, while_end))
+            yield from self.tacgen_cond_steps(exp.condition, while_body, while_end)
 
             self.cur_tacfunc.append(while_body)
-            self.tacgen_exp(exp.while_body)
+            (yield Unused(exp.while_body))
             self.cur_tacfunc.append(TacBr(true_label=while_start))
 
             self.cur_tacfunc.append(while_end)
+            if not used:
+                return None
             void_reg = self.cur_tacfunc.create_reg()
             self.cur_tacfunc.append(TacLoadImm(TacImm(0), void_reg))
             return void_reg
         elif isinstance(exp, Block):
-            for expr in exp.body:
-                ret_reg = self.tacgen_exp(expr)
-            return ret_reg
+            # every value but the last is discarded, and the last is boxed by our own consumer if it needs it
+            for expr in exp.body[:-1]:
+                (yield Unused(expr))
+            return (yield Prim(exp.body[-1]) if used else Unused(exp.body[-1]))
         elif isinstance(exp, Assign):
-            rhs_reg = self.tacgen_exp(exp.rhs)
-            ret_reg = self.cur_tacfunc.create_reg()
+            rhs_reg = (yield exp.rhs)
+            ret_reg = self.cur_tacfunc.create_reg() if used else None
 
             # we differentiate between a normal variable and a class attribute
-            if self.symbol_table[exp.lhs.name]:
-                self.cur_tacfunc.append(TacStore(rhs_reg, self.symbol_table[exp.lhs.name][-1]))
-                self.cur_tacfunc.append(TacLoad(self.symbol_table[exp.lhs.name][-1], ret_reg))
+            local_reg = self.symbol_table.lookup(exp.lhs.name)
+            if local_reg is not None:
+                self.cur_tacfunc.append(TacStore(rhs_reg, local_reg))
+                if used:
+                    self.cur_tacfunc.append(TacLoad(local_reg, ret_reg))
             else:
-                self.cur_tacfunc.append(TacStore(rhs_reg, self.self_reg(), self.attr_table[exp.lhs.name]))
-                self.cur_tacfunc.append(TacLoad(self.self_reg(), ret_reg, self.attr_table[exp.lhs.name]))
+                attr_offset = self.symbol_table.attr_offset(exp.lhs.name)
+                self.cur_tacfunc.append(TacStore(rhs_reg, self.self_reg(), attr_offset))
+                if used:
+                    self.cur_tacfunc.append(TacLoad(self.self_reg(), ret_reg, attr_offset))
             return ret_reg
         elif isinstance(exp, Let):
             # adding additional registers into the symbol table
             for let_binding in exp.binding_list:
                 binding_name = let_binding.get_var_name()
-                if let_binding.var_type.get_name() in {"Bool", "Int", "String"}:
-                    create_reg = self.cur_tacfunc.create_reg()
-                    self.cur_tacfunc.append(TacCreate(let_binding.var_type.get_name(), create_reg))
+                # the binding is not in scope inside its own initializer, so nothing can see a default it would overwrite
+                if let_binding.has_init():
+                    init_res = (yield let_binding.val)
+                    self.cur_tacfunc.append(TacStore(init_res, self.declaration_list.get_tacreg(let_binding)))
+                elif let_binding.var_type.get_name() in {"Bool", "Int", "String"}:
+                    create_reg = self.default_object(let_binding.var_type.get_name())
                     self.cur_tacfunc.append(TacStore(create_reg, self.declaration_list.get_tacreg(let_binding)))
                 else:
                     void_reg = self.cur_tacfunc.create_reg()
                     self.cur_tacfunc.append(TacLoadImm(TacImm(0), void_reg))
                     self.cur_tacfunc.append(TacStore(void_reg, self.declaration_list.get_tacreg(let_binding)))
-                if let_binding.has_init():
-                    init_res = self.tacgen_exp(let_binding.val)
-                    self.cur_tacfunc.append(TacStore(init_res, self.declaration_list.get_tacreg(let_binding)))
-                self.symbol_table[binding_name].append(self.declaration_list.get_tacreg(let_binding))
+                self.symbol_table.bind(binding_name, self.declaration_list.get_tacreg(let_binding))
             
-            ret_reg = self.tacgen_exp(exp.expr)
+            ret_reg = (yield Prim(exp.expr) if used else Unused(exp.expr))
 
             for let_binding in exp.binding_list:
-                self.symbol_table[let_binding.get_var_name()].pop()
+                self.symbol_table.unbind(let_binding.get_var_name())
             
             return ret_reg
 
         elif isinstance(exp, Case):
             # set up the branches
-            cur_obj = self.tacgen_exp(exp.case_expr)
+            cur_obj = (yield exp.case_expr)
             void_branch = self.cur_tacfunc.create_label()
             nonvoid_branch = self.cur_tacfunc.create_label()
             void_reg = self.cur_tacfunc.create_reg()
@@ -506,57 +787,89 @@ class Tac(object):
             self.cur_tacfunc.append(TacCmp(void_reg, cur_obj))
             self.cur_tacfunc.append(TacBr(TacCmpOp.NE, nonvoid_branch, void_branch))
             self.cur_tacfunc.append(void_branch)
-            error_str = self.cur_tacfunc.create_reg()
-            self.cur_tacfunc.append(TacLoadImm(TacStr(f"ERROR: {exp.lineno}: Exception: case on void\\n"), error_str))
-            self.cur_tacfunc.append(TacSyscall("cooloutstr", [error_str], self.cur_tacfunc.create_reg()))
-            zero_reg = self.cur_tacfunc.create_reg()
-            self.cur_tacfunc.append(TacLoadImm(TacImm(0), zero_reg))
-            self.cur_tacfunc.append(TacSyscall("exit", [zero_reg], self.cur_tacfunc.create_reg()))
-            self.cur_tacfunc.append(TacUnreachable())
+            self.cur_tacfunc.append(TacTrap("case_void_error", exp.lineno))
             self.cur_tacfunc.append(nonvoid_branch)
 
             # load in the classtag
             class_tag = self.cur_tacfunc.create_reg()
             self.cur_tacfunc.append(TacLoad(cur_obj, class_tag, 0))
 
-            # generate all the labels
+            # one indirect jump through a table indexed by class tag picks the branch
+            case_labels = {case_elem.get_type(): self.cur_tacfunc.create_label() for case_elem in exp.case_list}
             error_label = self.cur_tacfunc.create_label()
-            case_labels = self.gen_case_labels(exp.case_list, error_label)
-            
-            # do comparison with classtags
-            for i, true_label in enumerate(case_labels):
-                false_label = self.cur_tacfunc.create_label() if i != len(case_labels) - 1 else error_label
-                case_class_tag = self.cur_tacfunc.create_reg()
-                self.cur_tacfunc.append(TacLoadImm(TacImm(i), case_class_tag))
-                self.cur_tacfunc.append(TacCmp(case_class_tag, class_tag))
-                self.cur_tacfunc.append(TacBr(TacCmpOp.EQ, true_label, false_label))
-                self.cur_tacfunc.append(false_label)
-
-            # if we fell through, we now need to generate an error condition
-            error_str = self.cur_tacfunc.create_reg()
-            self.cur_tacfunc.append(TacLoadImm(TacStr(f"ERROR: {exp.lineno}: Exception: case without matching branch\\n"), error_str))
-            self.cur_tacfunc.append(TacSyscall("cooloutstr", [error_str], self.cur_tacfunc.create_reg()))
-            zero_reg = self.cur_tacfunc.create_reg()
-            self.cur_tacfunc.append(TacLoadImm(TacImm(0), zero_reg))
-            self.cur_tacfunc.append(TacSyscall("exit@PLT", [zero_reg], self.cur_tacfunc.create_reg()))
-            self.cur_tacfunc.append(TacUnreachable())
+            branches = self.case_branches(frozenset(case_labels))
+            targets = [case_labels[branch] if branch is not None else error_label for branch in branches]
+            self.cur_tacfunc.append(TacSwitch(class_tag, targets, self.cur_tacfunc.create_label()))
+
+            # classes without a matching branch land here
+            if error_label in targets:
+                self.cur_tacfunc.append(error_label)
+                self.cur_tacfunc.append(TacTrap("case_unmatched_error", exp.lineno))
 
             # now generate the case expression labels
             case_end = self.cur_tacfunc.create_label()
             for case_elem in exp.case_list:
-                self.cur_tacfunc.append(case_labels[self.class_tags[case_elem.get_type()]])
-                self.symbol_table[case_elem.get_name()].append(self.declaration_list.get_tacreg(case_elem))
+                self.cur_tacfunc.append(case_labels[case_elem.get_type()])
+                self.symbol_table.bind(case_elem.get_name(), self.declaration_list.get_tacreg(case_elem))
                 self.cur_tacfunc.append(TacStore(cur_obj, self.declaration_list.get_tacreg(case_elem)))
-                elem_reg = self.tacgen_exp(case_elem.expr)
-                self.symbol_table[case_elem.get_name()].pop()
-                self.cur_tacfunc.append(TacStore(elem_reg, self.declaration_list.get_tacreg(exp)))
+                if used:
+                    elem_reg = (yield case_elem.expr)
+                    self.cur_tacfunc.append(TacStore(elem_reg, self.declaration_list.get_tacreg(exp)))
+                else:
+                    (yield Unused(case_elem.expr))
+                self.symbol_table.unbind(case_elem.get_name())
                 self.cur_tacfunc.append(TacBr(true_label=case_end))
 
             self.cur_tacfunc.append(case_end)
+            if not used:
+                return None
             ret_reg = self.cur_tacfunc.create_reg()
             self.cur_tacfunc.append(TacLoad(self.declaration_list.get_tacreg(exp), ret_reg))
             return ret_reg
 
+    def tacgen_cond_steps(self, exp:Expression, true_label:TacLabel, false_label:TacLabel) -> Generator[Union[Expression, Prim], TacReg, None]:
+        # branches on a condition straight from the flags, used by if and while through yield from
+        # not just swaps the targets, isvoid and inlined comparisons end in a compare and jump with no Bool at all
+        while isinstance(exp, Not):
+            exp = exp.rhs
+            true_label, false_label = false_label, true_label
+
+        if isinstance(exp, IsVoid):
+            obj_reg = (yield exp.rhs)
+            zero_reg = self.cur_tacfunc.create_reg()
+            self.cur_tacfunc.append(TacLoadImm(TacImm(0), zero_reg))
+            self.cur_tacfunc.append(TacCmp(obj_reg, zero_reg))
+            self.cur_tacfunc.append(TacBr(TacCmpOp.EQ, true_label, false_label))
+            return
+
+        kind = self.compare_kind(exp) if isinstance(exp, (Lt, Le, Eq)) else "helper"
+        if kind == "helper":
+            boolean_reg = self.unbox((yield Prim(exp)))
+            false_reg = self.cur_tacfunc.create_reg()
+            self.cur_tacfunc.append(TacLoadImm(TacImm(0), false_reg))
+            self.cur_tacfunc.append(TacCmp(boolean_reg, false_reg))
+            self.cur_tacfunc.append(TacBr(TacCmpOp.NE, true_label, false_label))
+            return
+
+        cmp_op = TacCmpOp.LT if isinstance(exp, Lt) else TacCmpOp.LE if isinstance(exp, Le) else TacCmpOp.EQ
+        if kind == "prim":
+            lhs_prim = self.unbox((yield Prim(exp.lhs)))
+            rhs_prim = self.unbox((yield Prim(exp.rhs)))
+            self.cur_tacfunc.append(TacCmp(lhs_prim, rhs_prim, 32))
+        elif kind == "string":
+            lhs_str = self.unbox((yield exp.lhs))
+            rhs_str = self.unbox((yield exp.rhs))
+            strcmp_reg = self.cur_tacfunc.create_reg()
+            self.cur_tacfunc.append(TacSyscall("strcmp", [lhs_str, rhs_str], strcmp_reg))
+            zero_reg = self.cur_tacfunc.create_reg()
+            self.cur_tacfunc.append(TacLoadImm(TacImm(0), zero_reg))
+            self.cur_tacfunc.append(TacCmp(strcmp_reg, zero_reg, 32))
+        else:
+            lhs_reg = (yield exp.lhs)
+            rhs_reg = (yield exp.rhs)
+            self.cur_tacfunc.append(TacCmp(lhs_reg, rhs_reg))
+        self.cur_tacfunc.append(TacBr(cmp_op, true_label, false_label))
+
     def debug_tac(self) -> None:
         for func in self.processed_funcs:
             print(repr(func))
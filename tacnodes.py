@@ -30,6 +30,8 @@ class TacOp(Enum):
     ALLOC = auto()
     STORESELF = auto()
     CMP = auto()
+    SWITCH = auto()
+    TRAP = auto()
 
 
 class TacCmpOp(Enum):
@@ -195,6 +197,15 @@ class TacImmLabel(TacImm):
     def __repr__(self) -> str:
         return self.val
 
+class TacConstObj(TacImm):
+    # address of an immutable Int/String object laid out in the data section by codegen
+    def __init__(self, obj_type:str, val:Union[int, str]):
+        super().__init__(val)
+        self.obj_type = obj_type
+
+    def __repr__(self) -> str:
+        return f"{self.obj_type}({self.val!r})"
+
 class TacErrorStr(TacImm):
     def __init__(self, val:str):
         super().__init__(val)
@@ -348,16 +359,42 @@ class TacBr(TacInst):
         return labels
 
 
+class TacSwitch(TacInst):
+    # indirect jump through a table with one target per possible value of src, starting at 0
+    def __init__(self, src:TacReg, targets:List[TacLabel], table_label:TacLabel):
+        super().__init__(TacOp.SWITCH, {src}, None)
+        self.src = src
+        self.targets = targets
+        self.table_label = table_label
+
+    def __repr__(self) -> str:
+        inst_str = f"switch {repr(self.src)} [{', '.join(f'label %{target.num}' for target in self.targets)}]"
+        return f"{inst_str:<75} ; live: {repr(self.live_out) if self.live_out else ''}\n"
+
+    def get_src_operands(self) -> List[Union[TacReg, TacImm]]:
+        return [self.src]
+
+    def get_branch_targets(self) -> List[TacLabel]:
+        labels:List[TacLabel] = []
+        for target in self.targets:
+            if target not in labels:
+                labels.append(target)
+
+        return labels
+
+
 class TacIcmp(TacInst):
-    def __init__(self, icmp_op:TacCmpOp, src1:TacReg, src2:TacReg, dest:TacReg):
+    # dest = 1 if src1 op src2 else 0, Int values only have meaningful low 32 bits so they compare with width 32
+    def __init__(self, icmp_op:TacCmpOp, src1:TacReg, src2:TacReg, dest:TacReg, width:int=64):
         super().__init__(TacOp.ICMP, {src1, src2}, {dest})
         self.icmp_op = icmp_op
         self.src1 = src1
         self.src2 = src2
         self.dest = dest
+        self.width = width
     
     def __repr__(self) -> str:
-        inst_str = f"{repr(self.dest)} = icmp {self.icmp_op.name.lower()} {repr(self.src1)} {repr(self.src2)}"
+        inst_str = f"{repr(self.dest)} = icmp{self.width} {self.icmp_op.name.lower()} {repr(self.src1)} {repr(self.src2)}"
         return f"{inst_str:<75} ; live: {repr(self.live_out) if self.live_out else ''}\n"
 
     def get_dest_operand(self) -> TacReg:
@@ -368,13 +405,15 @@ class TacIcmp(TacInst):
 
 
 class TacCmp(TacInst):
-    def __init__(self, src1:TacReg, src2:TacReg):
+    # sets the flags for the TacBr that follows, which branches if src1 cond src2
+    def __init__(self, src1:TacReg, src2:TacReg, width:int=64):
         super().__init__(TacOp.ICMP, {src1, src2}, {})
         self.src1 = src1
         self.src2 = src2
+        self.width = width
     
     def __repr__(self) -> str:
-        inst_str = f"cmp {repr(self.src1)} {repr(self.src2)}"
+        inst_str = f"cmp{self.width if self.width != 64 else ''} {repr(self.src1)} {repr(self.src2)}"
         return f"{inst_str:<75} ; live: {repr(self.live_out) if self.live_out else ''}\n"
 
     def get_src_operands(self) -> List[Union[TacReg, TacImm]]:
@@ -623,6 +662,17 @@ class TacUnreachable(TacInst):
         return "unreachable\n"
 
 
+class TacTrap(TacInst):
+    # ends an error block: hands lineno to the runtime's func stub, which reports it and exits
+    def __init__(self, func:str, lineno:int):
+        super().__init__(TacOp.TRAP, None, None)
+        self.func = func
+        self.lineno = lineno
+
+    def __repr__(self) -> str:
+        return f"trap {self.func} {self.lineno}\n"
+
+
 class TacAlloc(TacInst):
     def __init__(self, obj:str, dest:TacReg):
         super().__init__(TacOp.ALLOC, None, {dest})
@@ -0,0 +1,45 @@
+import os
+import subprocess
+import sys
+import tempfile
+import traceback
+from compiler import compile_typed_ast
+from main import compile_file
+
+# Checks that the in-process compile_typed_ast API compiles exactly what the command line compiles
+# usage: python3 test_api.py
+
+# raw control characters are legal inside a COOL string literal and show up unescaped in the .cl-type text
+PROGRAMS = {
+    "form_feed": 'class Main inherits IO {\n  main() : Object { out_string("form\ffeed\\n") };\n};\n',
+}
+
+
+def test_program(tmp_dir, name, source):
+    cl_file = os.path.join(tmp_dir, name + ".cl")
+    with open(cl_file, "w") as file:
+        file.write(source)
+    subprocess.run(["../cool", "--type", cl_file], check=True)
+
+    try:
+        with open(cl_file + "-type", "rb") as file:
+            asm = compile_typed_ast(file.read())
+        compile_file(cl_file + "-type")
+    except Exception:
+        print(f"FAIL: {name}")
+        traceback.print_exc()
+        return False
+
+    with open(os.path.join(tmp_dir, name + ".s")) as file:
+        if file.read() != asm:
+            print(f"FAIL: {name}: compile_typed_ast and the command line disagree")
+            return False
+    print(f"PASS: {name}")
+    return True
+
+
+if __name__ == '__main__':
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        results = [test_program(tmp_dir, name, source) for name, source in PROGRAMS.items()]
+    if not all(results):
+        sys.exit(1)
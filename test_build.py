@@ -3,6 +3,8 @@ import itertools
 import subprocess
 import os
 import sys
+import traceback
+from compiler import compile_typed_ast
 
 
 for cool_f in itertools.chain(glob.glob("tests/*.cl")):
@@ -21,13 +23,15 @@ for cool_f in itertools.chain(glob.glob("tests/*.cl")):
     #correct_result = subprocess.run(["../cool", "--x86", cool_f], capture_output=True, text=True)
 
     # make sure we can actually build every program
-    our_result = subprocess.run([sys.executable, "main.py", test_f], capture_output=True, text=True)
-    file_created = os.path.isfile(output_f)
-
-    if not file_created:
+    try:
+        with open(test_f, 'rb') as file:
+            asm = compile_typed_ast(file.read())
+    except Exception:
         print(f"FAIL: {test_name}")
-        print(our_result.stdout)
-        print(our_result.stderr)
+        traceback.print_exc()
         break
+
+    with open(output_f, "w") as file:
+        file.write(asm)
     
     print(f"PASS: {test_name}")
@@ -0,0 +1,106 @@
+import glob
+import os
+import pickle
+import shutil
+import subprocess
+import sys
+import tempfile
+from astcache import AstCache, FlatMaps
+from coolast import *
+
+# Checks that the caches notice changes to the compiler instead of serving stale entries
+# usage: python3 test_cache.py
+
+# every module that takes part in turning a function into assembly, including compiler.py which orders the passes,
+# editing any of them must miss the asm cache
+ASM_BACKEND_MODULES = ["tac.py", "tacnodes.py", "cfg.py", "cfgnodes.py", "optimizations.py", "codegen.py", "stackgen.py", "compiler.py"]
+
+KEY_SCRIPT = (
+    "import sys\n"
+    "from asmcache import AsmCache\n"
+    "print(AsmCache(sys.argv[1]).function_key('Main.main', 'ast', 'interface', '-O0'))\n"
+)
+
+
+def asm_function_key(compiler_dir, cache_dir):
+    result = subprocess.run([sys.executable, "-c", KEY_SCRIPT, cache_dir], cwd=compiler_dir,
+                            capture_output=True, text=True, check=True)
+    return result.stdout.strip()
+
+
+def test_asm_key_tracks_backend_modules():
+    failures = 0
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        compiler_dir = os.path.join(tmp_dir, "compiler")
+        os.mkdir(compiler_dir)
+        for module in glob.glob("*.py"):
+            shutil.copy(module, compiler_dir)
+        cache_dir = os.path.join(tmp_dir, "cache")
+        original_key = asm_function_key(compiler_dir, cache_dir)
+
+        for module in ASM_BACKEND_MODULES:
+            path = os.path.join(compiler_dir, module)
+            with open(path) as file:
+                source = file.read()
+            with open(path, "a") as file:
+                file.write("\n# edited\n")
+            if asm_function_key(compiler_dir, cache_dir) == original_key:
+                failures += 1
+                print(f"FAIL: editing {module} keeps the asm cache key")
+            with open(path, "w") as file:
+                file.write(source)
+
+    if not failures:
+        print("PASS: asm cache key tracks the backend modules")
+    return failures == 0
+
+
+class Slotted(object):
+    __slots__ = ("old_name",)
+
+
+def test_stale_ast_entry_is_a_miss():
+    with tempfile.TemporaryDirectory() as cache_dir:
+        cache = AstCache(cache_dir)
+        path = cache.entry_path("stale")
+        # an entry written before a slot was renamed fails with AttributeError rather than UnpicklingError
+        entry = Slotted()
+        entry.old_name = None
+        with open(path, "wb") as file:
+            file.write(pickle.dumps(entry).replace(b"old_name", b"new_name"))
+
+        if cache.load("stale") is not None or os.path.exists(path) or cache.stats["misses"] != 1:
+            print("FAIL: a stale ast cache entry is not dropped as a miss")
+            return False
+    print("PASS: a stale ast cache entry is dropped as a miss")
+    return True
+
+
+def test_deep_ast_entry_round_trips():
+    # far deeper than pickle can recurse, the entry must still be stored and come back unchanged
+    expr = Integer(1, "0", "Int")
+    for lineno in range(20000):
+        expr = Plus(lineno, Integer(lineno, "1", "Int"), expr, "Int")
+    method = ImplMethod("main", [], "Main", expr)
+    maps = ([ClassMapEntry("Main", [])], [ImplMapEntry("Main", [method]), ImplMapEntry("Sub", [method])],
+            [ParentMapEntry("Object", "Main")])
+
+    with tempfile.TemporaryDirectory() as cache_dir:
+        cache = AstCache(cache_dir)
+        cache.store("deep", maps)
+        loaded = cache.load("deep")
+
+    if loaded is None or cache.stats["stores"] != 1 or FlatMaps(loaded).ops != FlatMaps(maps).ops:
+        print("FAIL: a deeply nested program does not round trip through the ast cache")
+        return False
+    if loaded[1][0].method_list[0] is not loaded[1][1].method_list[0]:
+        print("FAIL: a method shared between classes is no longer shared after the ast cache")
+        return False
+    print("PASS: a deeply nested program round trips through the ast cache")
+    return True
+
+
+if __name__ == '__main__':
+    tests = [test_asm_key_tracks_backend_modules, test_stale_ast_entry_is_a_miss, test_deep_ast_entry_round_trips]
+    if not all([test() for test in tests]):
+        sys.exit(1)